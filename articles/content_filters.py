@@ -2,13 +2,21 @@
 Classes used to modify article content.
 
 Generally used from the ./manage.py shell in order to make permanent changes to the
-article content in the database.
+article content in the database, or over the whole archive at once with
+./manage.py run_content_filter.
 """
 
+from __future__ import annotations
+
 from abc import ABC
+from dataclasses import dataclass, field
+import difflib
 import html
+import random
 import re
-from typing import Generic, Iterator, List, Optional, Type, TypeVar
+import time
+from functools import cached_property
+from typing import Callable, Dict, Generic, Iterator, List, Optional, Sequence, Type, TypeVar
 
 import shortcodes
 from django.db.models import QuerySet
@@ -18,6 +26,10 @@ from .models import Article
 
 ArticleT = TypeVar("ArticleT", bound=Article)
 
+# The shortcodes of the imported WordPress content, handled by the filters below and
+# by articles.rewriters. Any other text in square brackets is kept, see articles.text.
+SHORTCODE_NAMES = ("addlink", "caption", "inbound_button")
+
 
 class ContentFilter(ABC):
     def __init__(self, replace_with: Optional[str] = None):
@@ -29,19 +41,51 @@ class ContentFilter(ABC):
         pass
 
 
-class NBSPFilter(ContentFilter):
+class ReplaceFilter(ContentFilter):
+    """
+    A filter which only replaces fixed strings.
+    Several of them can be fused into a single pass by FilterChain.
+    """
+
+    def replacements(self) -> Dict[str, str]:
+        return {}
+
     def filter(self, content: str) -> str:
-        return content.replace("&nbsp;", self.replace_with).replace(
-            "\xa0", self.replace_with
-        )
+        for old, new in self.replacements().items():
+            content = content.replace(old, new)
+        return content
+
+
+class NBSPFilter(ReplaceFilter):
+    def replacements(self) -> Dict[str, str]:
+        return {"&nbsp;": self.replace_with, "\xa0": self.replace_with}
+
+
+class AMPFilter(ReplaceFilter):
+    def replacements(self) -> Dict[str, str]:
+        return {"&amp;": self.replace_with}
 
 
-class AMPFilter(ContentFilter):
+class ShortcodeFilter(ContentFilter):
+    """
+    A filter which expands shortcodes.
+    Several of them can share a single parser in FilterChain.
+    """
+
+    def register(self, parser: shortcodes.Parser):
+        pass
+
+    @cached_property
+    def parser(self) -> shortcodes.Parser:
+        parser = shortcodes.Parser(start="[", end="]", ignore_unknown=True)
+        self.register(parser)
+        return parser
+
     def filter(self, content: str) -> str:
-        return content.replace("&amp;", self.replace_with)
+        return self.parser.parse(content)
 
 
-class ShortcodeFilterInboundButton(ContentFilter):
+class ShortcodeFilterInboundButton(ShortcodeFilter):
     @staticmethod
     def inbound_button_handler(args, kwargs, context, content):
         target = kwargs.get("target", "")
@@ -49,10 +93,8 @@ class ShortcodeFilterInboundButton(ContentFilter):
             target = f' target="{target}"'
         return f"""<a href="{kwargs['url']}"{target}>{content}</a>"""
 
-    def filter(self, content: str) -> str:
-        parser = shortcodes.Parser(start="[", end="]", ignore_unknown=True)
+    def register(self, parser: shortcodes.Parser):
         parser.register(self.inbound_button_handler, "inbound_button", "/inbound_button")
-        return parser.parse(content)
 
 
 # class ShortcodeAddlink(ContentFilter):
@@ -77,11 +119,107 @@ class ShortcodeFilterInboundButton(ContentFilter):
 #             return content
 
 
+@dataclass
+class FilterEstimate:
+    """The projected impact of running a filter, see ContentLocator.estimate."""
+
+    # Number of articles the filter would run on
+    total: int
+    sample_size: int
+    # Number of worker processes of the projected run
+    workers: int = 1
+    # Number of sampled articles that the filter changed
+    hits: int = 0
+    bytes_changed: int = 0
+    # Time spent filtering and serialising the sampled articles, once loaded
+    seconds: float = 0.0
+    # Unified diffs of the changed segments of the articles, by article id
+    diffs: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.sample_size if self.sample_size else 0.0
+
+    @property
+    def avg_bytes_changed(self) -> float:
+        """Average over the changed articles only."""
+        return self.bytes_changed / self.hits if self.hits else 0.0
+
+    @property
+    def seconds_per_article(self) -> float:
+        return self.seconds / self.sample_size if self.sample_size else 0.0
+
+    @property
+    def projected_hits(self) -> int:
+        return round(self.hit_rate * self.total)
+
+    @property
+    def projected_seconds(self) -> float:
+        return self.seconds_per_article * self.total / self.workers
+
+    def as_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "sample_size": self.sample_size,
+            "workers": self.workers,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "avg_bytes_changed": self.avg_bytes_changed,
+            "seconds_per_article": self.seconds_per_article,
+            "projected_hits": self.projected_hits,
+            "projected_seconds": self.projected_seconds,
+            "diffs": self.diffs,
+        }
+
+
+def changed_bytes(before: str, after: str) -> int:
+    """
+    The number of bytes changed between two versions of a segment. Only the part
+    between the common prefix and suffix is compared with a SequenceMatcher.
+    """
+    before_bytes, after_bytes = before.encode(), after.encode()
+    shortest = min(len(before_bytes), len(after_bytes))
+    prefix = 0
+    while prefix < shortest and before_bytes[prefix] == after_bytes[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < shortest - prefix
+        and before_bytes[-suffix - 1] == after_bytes[-suffix - 1]
+    ):
+        suffix += 1
+    before_bytes = before_bytes[prefix:len(before_bytes) - suffix]
+    after_bytes = after_bytes[prefix:len(after_bytes) - suffix]
+
+    matcher = difflib.SequenceMatcher(None, before_bytes, after_bytes, autojunk=False)
+    return sum(
+        max(i2 - i1, j2 - j1)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    )
+
+
 class ContentLocator(ABC):
+    # The model field the locator modifies, so that callers can save only that field.
+    field_name: str
+
     @classmethod
     def filter_content(cls, article: ArticleT, content_filter: ContentFilter) -> ArticleT:
         pass
 
+    @classmethod
+    def get_segments(cls, article: ArticleT) -> List[str]:
+        """
+        The located content, split into the segments the filter works on. Each
+        filter run keeps the number of segments, so they can be compared pairwise.
+        """
+        return [getattr(article, cls.field_name)]
+
+    @classmethod
+    def get_content(cls, article: ArticleT) -> str:
+        """The located content as a single string."""
+        return "\n\n".join(cls.get_segments(article))
+
     @classmethod
     def filter_all(
         cls, qs: QuerySet[ArticleT], content_filter: ContentFilter
@@ -89,18 +227,110 @@ class ContentLocator(ABC):
         for article in qs:
             yield cls.filter_content(article, content_filter)
 
+    @classmethod
+    def serialize(cls, article: ArticleT):
+        """
+        Prepares the located field for the database like a real run would when saving,
+        without writing anything, so that no row is locked by an estimate.
+        """
+        field = article._meta.get_field(cls.field_name)
+        return field.get_prep_value(getattr(article, cls.field_name))
+
+    @classmethod
+    def estimate(
+        cls,
+        qs: QuerySet[ArticleT],
+        content_filter: ContentFilter,
+        sample_size: int = 100,
+        with_diffs: bool = False,
+        seed: Optional[int] = None,
+        workers: int = 1,
+    ) -> FilterEstimate:
+        """
+        Runs the filter on a random sample of the articles without saving them,
+        to find out how many articles a run over the whole queryset would change
+        and how long it would take with the given number of worker processes.
+        """
+        ids = list(qs.values_list("pk", flat=True))
+        sample_ids = random.Random(seed).sample(ids, min(sample_size, len(ids)))
+        estimate = FilterEstimate(
+            total=len(ids), sample_size=len(sample_ids), workers=max(workers, 1)
+        )
+
+        # The articles are fetched by chunks, so the timer starts once each one is
+        # loaded, and only times the filtering and the serialisation of a real run.
+        for article in qs.filter(pk__in=sample_ids).order_by("pk").iterator():
+            start = time.perf_counter()
+            before = cls.get_segments(article)
+            cls.filter_content(article, content_filter)
+            after = cls.get_segments(article)
+            if before != after:
+                cls.serialize(article)
+            estimate.seconds += time.perf_counter() - start
+            if before == after:
+                continue
+
+            estimate.hits += 1
+            changed = [
+                (index, old, new)
+                for index, (old, new) in enumerate(zip(before, after))
+                if old != new
+            ]
+            estimate.bytes_changed += sum(changed_bytes(old, new) for _, old, new in changed)
+            if with_diffs:
+                estimate.diffs[article.pk] = "\n".join(
+                    line
+                    for index, old, new in changed
+                    for line in difflib.unified_diff(
+                        old.splitlines(),
+                        new.splitlines(),
+                        fromfile=f"{article.pk}/{cls.field_name}/{index}",
+                        tofile=f"{article.pk}/{cls.field_name}/{index}",
+                        lineterm="",
+                    )
+                )
+
+        return estimate
+
 
 class ArticleBodyRichTexts(ContentLocator):
+    field_name = "body"
+
+    @staticmethod
+    def is_rich_text(child_blocks, item: Dict) -> bool:
+        # The blocks of a type removed from the StreamField are left as they are
+        return isinstance(child_blocks.get(item["type"]), RichTextBlock)
+
+    @classmethod
+    def get_segments(cls, article: ArticleT) -> List[str]:
+        child_blocks = article.body.stream_block.child_blocks
+        return [
+            item["value"]
+            for item in article.body.raw_data
+            if cls.is_rich_text(child_blocks, item)
+        ]
+
     @classmethod
     def filter_content(cls, article: ArticleT, content_filter: ContentFilter) -> ArticleT:
-        for block in article.body:
-            if not isinstance(block.block, RichTextBlock):
+        """
+        Works on the raw stream data, so the other blocks (e.g. images) are never
+        converted to their Python values and do not cost any queries.
+        """
+        child_blocks = article.body.stream_block.child_blocks
+        raw_data = article.body.raw_data
+        for i, item in enumerate(raw_data):
+            if not cls.is_rich_text(child_blocks, item):
                 continue
-            block.value.source = content_filter.filter(block.value.source)
+            value = content_filter.filter(item["value"])
+            if value != item["value"]:
+                # Replacing the whole item drops the stale bound block, if there is one
+                raw_data[i] = {**item, "value": value}
         return article
 
 
 class ArticleExcerpt(ContentLocator):
+    field_name = "excerpt"
+
     @classmethod
     def filter_content(cls, article: ArticleT, content_filter: ContentFilter) -> ArticleT:
         article.excerpt = content_filter.filter(article.excerpt)
@@ -108,7 +338,110 @@ class ArticleExcerpt(ContentLocator):
 
 
 class ArticleTitle(ContentLocator):
+    field_name = "title"
+
     @classmethod
     def filter_content(cls, article: ArticleT, content_filter: ContentFilter) -> ArticleT:
         article.title = content_filter.filter(article.title)
         return article
+
+
+class FilterChain(ContentFilter):
+    """
+    Applies several filters in order, parsing each piece of content as few times
+    as possible.
+
+    Consecutive ReplaceFilters are fused into a single str.translate or regex pass
+    and consecutive ShortcodeFilters share one parser. Unlike applying the filters
+    one by one, the replaced text is not scanned again by the following filters
+    of the same group.
+    """
+
+    def __init__(self, filters: Sequence[ContentFilter]):
+        super().__init__()
+        self.filters = filters
+        self.steps = [self._fuse(group) for group in self._group(filters)]
+
+    @staticmethod
+    def _group(filters: Sequence[ContentFilter]) -> Iterator[List[ContentFilter]]:
+        group: List[ContentFilter] = []
+        for content_filter in filters:
+            if group and not (
+                isinstance(content_filter, ReplaceFilter)
+                and isinstance(group[0], ReplaceFilter)
+                or isinstance(content_filter, ShortcodeFilter)
+                and isinstance(group[0], ShortcodeFilter)
+            ):
+                yield group
+                group = []
+            group.append(content_filter)
+        if group:
+            yield group
+
+    @staticmethod
+    def _fuse(group: List[ContentFilter]) -> Callable[[str], str]:
+        if isinstance(group[0], ReplaceFilter):
+            table: Dict[str, str] = {}
+            for content_filter in group:
+                for old, new in content_filter.replacements().items():
+                    # The first filter wins, as it would when applied one by one
+                    table.setdefault(old, new)
+            if all(len(old) == 1 for old in table):
+                translation = str.maketrans(table)
+                return lambda content: content.translate(translation)
+            # Longest first, so that e.g. "&amp;" is not shadowed by a shorter prefix
+            pattern = re.compile(
+                "|".join(map(re.escape, sorted(table, key=len, reverse=True)))
+            )
+            return lambda content: pattern.sub(lambda match: table[match[0]], content)
+
+        if isinstance(group[0], ShortcodeFilter):
+            parser = shortcodes.Parser(start="[", end="]", ignore_unknown=True)
+            for content_filter in group:
+                content_filter.register(parser)
+            return parser.parse
+
+        return group[0].filter
+
+    def filter(self, content: str) -> str:
+        for step in self.steps:
+            content = step(content)
+        return content
+
+    def filter_article(
+        self,
+        article: ArticleT,
+        locators: Sequence[Type[ContentLocator]] = (
+            ArticleTitle,
+            ArticleExcerpt,
+            ArticleBodyRichTexts,
+        ),
+    ) -> List[str]:
+        """
+        Runs the chain over the title, excerpt and body (or the given locators)
+        in a single visit of the article.
+
+        :return: The names of the changed fields. The article is not saved.
+        """
+        changed_fields = []
+        for locator in locators:
+            tracker = _ChangeTracker(self)
+            locator.filter_content(article, tracker)
+            if tracker.changed:
+                changed_fields.append(locator.field_name)
+        return changed_fields
+
+
+class _ChangeTracker(ContentFilter):
+    """Wraps a filter and remembers whether it has changed any content."""
+
+    def __init__(self, content_filter: ContentFilter):
+        super().__init__()
+        self.content_filter = content_filter
+        self.changed = False
+
+    def filter(self, content: str) -> str:
+        filtered = self.content_filter.filter(content)
+        if filtered != content:
+            self.changed = True
+        return filtered
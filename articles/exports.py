@@ -0,0 +1,128 @@
+"""
+CSV and XLSX exports of the article lists in the admin.
+
+The exports of modeladmin load every article and read each exported relation per
+row. Here the columns are read with values() and iterator(), and the names of the
+authors, topics and summits with one query each per batch of articles, so the
+memory used does not grow with the archive. The CSV is streamed as it is written,
+and the XLSX is written row by row to a temporary file, then streamed from it.
+"""
+
+import csv
+import tempfile
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from typing import Dict, Iterator, List, Type
+
+from django.db.models import Model
+from django.http import FileResponse
+from wagtail.admin.views.mixins import Echo, ExcelDateFormatter, SpreadsheetExportMixin
+from xlsxwriter.workbook import Workbook
+
+from .models import ArticleAuthorsOrderable, ArticleSummitsConnection, ArticleTopicConnection
+
+EXPORT_BATCH_SIZE = 1000
+
+# The columns with the names of the related objects, in their sort order.
+# Every article type has the summits panel, so its column is in every export.
+RELATED_NAMES = {
+    "authors": (ArticleAuthorsOrderable, "author__display_name"),
+    "topics": (ArticleTopicConnection, "topic__name"),
+    "summits": (ArticleSummitsConnection, "summit__name"),
+}
+
+
+def empty_cell(value) -> str:
+    return ""
+
+
+def related_names(model: Type[Model], name_field: str, article_ids: List[int]) -> Dict[int, List[str]]:
+    names = defaultdict(list)
+    rows = (
+        model.objects.filter(article_id__in=article_ids)
+        .order_by("article_id", "sort_order")
+        .values_list("article_id", name_field)
+    )
+    for article_id, name in rows:
+        names[article_id].append(name)
+    return names
+
+
+class ArticleExportMixin:
+    """For the index views of the article model admins with list_export."""
+
+    export_headings = {
+        "cached_full_url": "URL",
+        "authors": "Authors",
+        "topics": "Topics",
+        "summits": "Summits",
+    }
+    # Empty values, e.g. an article never published, as empty cells instead of "None"
+    custom_value_preprocess = {
+        **SpreadsheetExportMixin.custom_value_preprocess,
+        type(None): {
+            SpreadsheetExportMixin.FORMAT_CSV: empty_cell,
+            SpreadsheetExportMixin.FORMAT_XLSX: empty_cell,
+        },
+    }
+
+    def export_rows(self, queryset) -> Iterator[OrderedDict]:
+        related_fields = [field for field in self.list_export if field in RELATED_NAMES]
+        value_fields = [field for field in self.list_export if field not in RELATED_NAMES]
+        rows = (
+            queryset.prefetch_related(None)
+            .values("pk", *value_fields)
+            .iterator(chunk_size=EXPORT_BATCH_SIZE)
+        )
+        while True:
+            batch = list(islice(rows, EXPORT_BATCH_SIZE))
+            if not batch:
+                return
+            article_ids = [row["pk"] for row in batch]
+            names = {
+                field: related_names(*RELATED_NAMES[field], article_ids)
+                for field in related_fields
+            }
+            for row in batch:
+                yield OrderedDict(
+                    (field, names[field].get(row["pk"], []) if field in names else row[field])
+                    for field in self.list_export
+                )
+
+    def stream_csv(self, queryset):
+        writer = csv.DictWriter(Echo(), fieldnames=self.list_export)
+        yield writer.writerow(
+            {field: self.get_heading(queryset, field) for field in self.list_export}
+        )
+        for row_dict in self.export_rows(queryset):
+            yield self.write_csv_row(writer, row_dict)
+
+    def write_xlsx(self, queryset, output):
+        workbook = Workbook(
+            output,
+            {
+                # The rows are flushed to temporary files as they are written
+                "in_memory": False,
+                "constant_memory": True,
+                "remove_timezone": True,
+                "default_date_format": ExcelDateFormatter().get(),
+            },
+        )
+        worksheet = workbook.add_worksheet()
+        for col_number, field in enumerate(self.list_export):
+            worksheet.write(0, col_number, self.get_heading(queryset, field))
+        for row_number, row_dict in enumerate(self.export_rows(queryset), start=1):
+            self.write_xlsx_row(worksheet, row_dict, row_number)
+        workbook.close()
+
+    def write_xlsx_response(self, queryset):
+        output = tempfile.TemporaryFile()
+        self.write_xlsx(queryset, output)
+        output.seek(0)
+        # Closing the response closes and so deletes the temporary file
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f"{self.get_filename()}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
@@ -1,81 +1,803 @@
+from __future__ import annotations
+
+import copy
 import datetime
+import gzip
 import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
 from email.utils import format_datetime
+from functools import cached_property
+from io import BytesIO, StringIO
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+from urllib.parse import urljoin
 
+from bs4 import BeautifulSoup
 from django.apps import apps
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection, models
 from django.db.models import Max
-from django.http import HttpResponse, HttpResponseNotAllowed
-from wagtail_feeds import feeds
-from wagtail_feeds.feeds import ExtendedFeed
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.feedgenerator import Rss201rev2Feed, SyndicationFeed
+from django.utils.http import quote_etag
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+from wagtail.core.models import Page, Site, get_page_models
+from wagtail.core.rich_text import expand_db_html
+from wagtail_feeds.feeds import CustomFeedGenerator, ExtendedFeed
 
+from articles.models import Article, ArticleTopic, Author, Generation, Summits
+from articles.process_cache import setting_for_request, site_for_request
 from articles.settings import ArticlesRSSFeedsSettings
+from articles.text import html_to_text
+
+try:
+    import brotli
+except ImportError:  # Optional, the feed is served gzipped without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Length of the descriptions taken from the body of the articles
+DESCRIPTION_WORDS = 55
+
+# The cached feeds are keyed by their ETag, so they never need to be invalidated
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# The cached items are keyed by the publication of their article as well
+ITEM_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Number of articles read and rendered at a time
+ITEM_BATCH_SIZE = 100
+# Larger feeds are streamed instead of cached as a whole
+STREAMING_FEED_SIZE = 2000
+
+# The names of the generations in the database, see Generation
+CONTENT_GENERATION = "feeds"
+ITEM_GENERATION = "feed_items"
+# For how many seconds a process can use its own copy of the content generation
+GENERATION_MEMORY_TIMEOUT = 1
+
+
+_configs: Dict[int, FeedConfig] = {}
+# When the content generation was read from the database, and its value
+_generation: Tuple[float, Optional[datetime.datetime]] = (0.0, None)
+
+
+def content_generation() -> datetime.datetime:
+    """
+    The time of the last publication, unpublication or deletion of an article,
+    or of the last change of the feed settings.
+
+    Bumped by the signal handlers and kept in the database, so that it only ever
+    moves forward and an old ETag is never valid again. Each process keeps a copy
+    in memory for a second, so that the validators of the feeds cost at most one
+    query a second. The first time, it is calculated from the articles and settings.
+    """
+    global _generation
+    read_at, generation = _generation
+    now = time.monotonic()
+    if generation is None or now - read_at > GENERATION_MEMORY_TIMEOUT:
+        generation = Generation.current(CONTENT_GENERATION, calculate_content_generation)
+        _generation = (now, generation)
+    return generation
+
+
+def calculate_content_generation() -> datetime.datetime:
+    return max(
+        filter(
+            None,
+            (
+                Page.objects.aggregate(Max("last_published_at"))["last_published_at__max"],
+                ArticlesRSSFeedsSettings.objects.aggregate(Max("last_changed_at"))[
+                    "last_changed_at__max"
+                ],
+            ),
+        ),
+        default=datetime.datetime.fromtimestamp(0, datetime.timezone.utc),
+    )
+
+
+def bump_content_generation():
+    """Called after the content of the feeds has changed, see signal_handlers."""
+    global _generation
+    _generation = (time.monotonic(), Generation.bump(CONTENT_GENERATION))
+
+
+def item_generation() -> str:
+    """
+    Part of the keys of the cached items, for the changes which do not publish
+    the articles again, e.g. a renamed author, a replaced image or a run of
+    run_content_filter.
+    """
+    return Generation.current(ITEM_GENERATION, timezone.now).isoformat()
+
+
+def bump_item_generation():
+    """Called after articles have changed without being published, see signal_handlers."""
+    Generation.bump(ITEM_GENERATION)
+    bump_content_generation()
+
+
+@dataclass(frozen=True)
+class FeedConfig:
+    """
+    The feed settings of a site, resolved once per version of the settings.
+    It is immutable, so it can be shared between the threads serving the feed.
+    """
+
+    title: Optional[str] = None
+    link: Optional[str] = None
+    description: Optional[str] = None
+    author_email: Optional[str] = None
+    author_link: Optional[str] = None
+    item_description_field: Optional[str] = None
+    item_content_field: Optional[str] = None
+    model: Type[models.Model] = Article
+    use_feed_image: bool = True
+    item_date_field: str = "first_published_at"
+    is_date_field_datetime: bool = True
+    feed_size: int = 500
+    cache_max_age: int = 0
+    cache_stale_while_revalidate: int = 0
+    last_changed_at: Optional[datetime.datetime] = None
+
+    @classmethod
+    def from_settings(cls, feed_settings: Optional[ArticlesRSSFeedsSettings]) -> FeedConfig:
+        if feed_settings is None:
+            return cls()
+
+        config = _configs.get(feed_settings.pk)
+        if config is not None and config.last_changed_at == feed_settings.last_changed_at:
+            return config
+
+        model = Article
+        if feed_settings.feed_app_label and feed_settings.feed_model_name:
+            model = apps.get_model(
+                app_label=feed_settings.feed_app_label,
+                model_name=feed_settings.feed_model_name,
+            )
+        config = cls(
+            title=feed_settings.feed_title,
+            link=feed_settings.feed_link,
+            description=feed_settings.feed_description,
+            author_email=feed_settings.feed_author_email,
+            author_link=feed_settings.feed_author_link,
+            item_description_field=feed_settings.feed_item_description_field,
+            item_content_field=feed_settings.feed_item_content_field,
+            model=model,
+            use_feed_image=feed_settings.feed_image_in_content,
+            # Articles have no "date" field, which wagtail_feeds falls back to
+            item_date_field=feed_settings.feed_item_date_field or "first_published_at",
+            is_date_field_datetime=(
+                feed_settings.is_feed_item_date_field_datetime
+                if feed_settings.feed_item_date_field
+                else True
+            ),
+            feed_size=feed_settings.feed_size,
+            cache_max_age=feed_settings.cache_max_age,
+            cache_stale_while_revalidate=feed_settings.cache_stale_while_revalidate,
+            last_changed_at=feed_settings.last_changed_at,
+        )
+        _configs[feed_settings.pk] = config
+        return config
+
+
+class ArticleFeedGenerator(CustomFeedGenerator):
+    """
+    Same as the generator of wagtail_feeds, but does not read its module globals.
+    The image is only present in the items when it should be added.
+
+    The items are rendered one by one and the feed is written in chunks around them,
+    see ArticleFeed.stream_feed.
+    """
+
+    # Part of the keys of the cached items
+    format_name = "rss"
+
+    def add_item_elements(self, handler, item):
+        Rss201rev2Feed.add_item_elements(self, handler, item)
+        handler.startElement("content:encoded", {})
+
+        content = "<![CDATA["
+        if item["image"]:
+            content += '<img src="%s"><hr>' % item["image"]
+        content += item["content"]
+        content += "]]>"
+
+        # Written directly so that the content is not escaped, see CustomFeedGenerator
+        handler._write(content)
+
+        handler.endElement("content:encoded")
+
+    def latest_post_date(self):
+        # The items are not added to the generator, see ArticleFeed.stream_feed
+        return self.feed.get("latest_post_date") or super().latest_post_date()
+
+    def render_item(self, item) -> str:
+        output = StringIO()
+        handler = SimplerXMLGenerator(output, "utf-8")
+        handler.startElement("item", self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement("item")
+        return output.getvalue()
+
+    def stream(self, fragments: Iterable[str]) -> Iterator[str]:
+        """The feed in chunks, with the rendered items in between."""
+        output = StringIO()
+        handler = SimplerXMLGenerator(output, "utf-8")
+        handler.startDocument()
+        handler.startElement("rss", self.rss_attributes())
+        handler.startElement("channel", self.root_attributes())
+        self.add_root_elements(handler)
+        yield output.getvalue()
+
+        yield from fragments
+
+        output.seek(0)
+        output.truncate()
+        self.endChannelElement(handler)
+        handler.endElement("rss")
+        yield output.getvalue()
+
+
+class ArticleJSONFeedGenerator(SyndicationFeed):
+    """JSON Feed 1.1, see https://www.jsonfeed.org/version/1.1/."""
+
+    content_type = "application/feed+json; charset=utf-8"
+    format_name = "json"
+
+    def latest_post_date(self):
+        return self.feed.get("latest_post_date") or super().latest_post_date()
+
+    def render_item(self, item) -> str:
+        content = item["content"]
+        if item["image"]:
+            content = '<img src="%s"><hr>' % item["image"] + content
+        data = {
+            "id": item["unique_id"] or item["link"],
+            "url": item["link"],
+            "title": item["title"],
+            "content_html": content,
+        }
+        if item["description"]:
+            data["summary"] = item["description"]
+        if item["image"]:
+            data["image"] = item["image"]
+        if item["pubdate"]:
+            data["date_published"] = item["pubdate"].isoformat()
+        if item["updateddate"]:
+            data["date_modified"] = item["updateddate"].isoformat()
+        if item["author_name"]:
+            author = {"name": item["author_name"]}
+            if item["author_link"]:
+                author["url"] = item["author_link"]
+            data["authors"] = [author]
+        if item["categories"]:
+            data["tags"] = list(item["categories"])
+        return json.dumps(data)
+
+    def stream(self, fragments: Iterable[str]) -> Iterator[str]:
+        """The feed in chunks, with the rendered items in between."""
+        data = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": self.feed["title"],
+            "home_page_url": self.feed["link"],
+            "feed_url": self.feed["feed_url"],
+        }
+        if self.feed["description"]:
+            data["description"] = self.feed["description"]
+        if self.feed["language"]:
+            data["language"] = self.feed["language"]
+        if self.feed["author_name"] or self.feed["author_link"]:
+            author = {"name": self.feed["author_name"]}
+            if self.feed["author_link"]:
+                author["url"] = self.feed["author_link"]
+            data["authors"] = [author]
+        yield json.dumps(data)[:-1] + ', "items": ['
+
+        for i, fragment in enumerate(fragments):
+            yield "," + fragment if i else fragment
+
+        yield "]}"
+
+    def write(self, outfile, encoding):
+        fragments = (self.render_item(item) for item in self.items)
+        for chunk in self.stream(fragments):
+            outfile.write(chunk.encode(encoding))
 
 
 class ArticleFeed(ExtendedFeed):
-    def items(self):
+    """
+    The instance registered in the URLs is never modified.
+    Each request is served by a copy of it holding the FeedConfig and the request.
+    """
+
+    feed_type = ArticleFeedGenerator
+    config = FeedConfig()
+    rendered_pks: List[int] = []
+    latest_post_date: Optional[datetime.datetime] = None
+
+    def title(self):
+        return self.config.title
+
+    def link(self):
+        return self.config.link
+
+    def description(self):
+        return self.config.description
+
+    def author_email(self):
+        return self.config.author_email
+
+    def author_link(self):
+        return self.config.author_link
+
+    @cached_property
+    def site_url(self) -> str:
+        site = site_for_request(self.request)
+        if site is None:
+            return self.request.build_absolute_uri("/").rstrip("/")
+        return site.root_url
+
+    def get_site_url(self):
+        return self.site_url
+
+    @cached_property
+    def item_version(self) -> str:
+        """
+        The rendered items depend on the site and the settings as well,
+        and on the related objects and unpublished changes, see item_generation.
+        """
+        return hashlib.sha1(
+            f"{self.site_url}|{self.config.last_changed_at}|{item_generation()}".encode()
+        ).hexdigest()[:12]
+
+    def item_key(self, pk: int, last_published_at) -> str:
+        published = last_published_at.timestamp() if last_published_at else None
+        return (
+            f"articles:feed_item:{self.feed_type.format_name}:{self.item_version}:"
+            f"{pk}:{published}"
+        )
+
+    def lookup_object(self, request, *args, **kwargs):
+        """The object the feed is about, from the URL arguments. None for all articles."""
+        return None
+
+    def get_object(self, request, *args, **kwargs):
+        # Looked up in __call__ already
+        return self.object
+
+    def articles(self, obj):
+        """All the articles in the feed about the object, in any order."""
+        return self.config.model.objects.live()
+
+    def window(self, obj):
         """
+        The articles in the feed.
         Restrict the feed size to the value set in the Wagtail settings.
         If not set, 500 articles is the default.
         """
-        feed_size = (
-            self.feed_settings.feed_size if self.feed_settings is not None else 500
+        return self.articles(obj).order_by("-" + self.config.item_date_field)[
+            : self.config.feed_size
+        ]
+
+    def items(self, obj):
+        """Only the articles whose items are being rendered, see render_items."""
+        return self.articles(obj).filter(pk__in=self.rendered_pks)
+
+    def stream_feed(self, obj) -> Iterator[str]:
+        """
+        The feed in chunks. The window is read in batches, so the memory used does
+        not grow with the size of the feed.
+
+        Each item is rendered once per publication of its article and cached,
+        keyed by the id and last_published_at of the article and the item_version.
+        Only the new and changed articles in the window are loaded and rendered,
+        the other items are spliced in from the cache. The items of articles
+        which drop out of the window are no longer read and expire.
+        The cache is shared by all the feeds, see TopicFeed etc.
+        """
+        rows = (
+            self.window(obj)
+            .values_list("pk", "last_published_at", self.config.item_date_field)
+            .iterator(chunk_size=ITEM_BATCH_SIZE)
         )
-        return super().items()[:feed_size]
+        batches = iter(lambda: list(islice(rows, ITEM_BATCH_SIZE)), [])
+        first_batch = next(batches, [])
+        if first_batch:
+            self.latest_post_date = self.pubdate(first_batch[0][2])
+
+        feedgen = self.get_feed(obj, self.request)
+        return feedgen.stream(self.iter_items(obj, chain([first_batch], batches)))
+
+    def iter_items(self, obj, batches: Iterable[List[Tuple]]) -> Iterator[str]:
+        for batch in batches:
+            keys = {pk: self.item_key(pk, published) for pk, published, _ in batch}
+            fragments = cache.get_many(keys.values())
+            missing_pks = [pk for pk, key in keys.items() if key not in fragments]
+            if missing_pks:
+                # Keyed by the last_published_at read from the window, which may be older
+                rendered = {
+                    keys[pk]: fragment
+                    for pk, fragment in self.render_items(obj, missing_pks).items()
+                }
+                cache.set_many(rendered, ITEM_CACHE_TIMEOUT)
+                fragments.update(rendered)
+
+            for key in keys.values():
+                # Missing if the article was unpublished while the feed was generated
+                if key in fragments:
+                    yield fragments[key]
+
+    def render_items(self, obj, pks: List[int]) -> Dict[int, str]:
+        """The rendered items of the articles, by id."""
+        self.rendered_pks = pks
+        feedgen = self.get_feed(obj, self.request)
+        self.rendered_pks = []
+        return {item["pk"]: feedgen.render_item(item) for item in feedgen.items}
+
+    def feed_extra_kwargs(self, obj):
+        return {"latest_post_date": self.latest_post_date}
+
+    def pubdate(self, value) -> Optional[datetime.datetime]:
+        if value is None:
+            return None
+        if not self.config.is_date_field_datetime:
+            value = datetime.datetime.combine(value, datetime.time())
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def item_pubdate(self, item):
+        return self.pubdate(getattr(item, self.config.item_date_field))
+
+    def item_description(self, item):
+        """
+        The description field as plain text, or the beginning of the body
+        if the description is empty.
+        """
+        description = None
+        if self.config.item_description_field:
+            description = html_to_text(getattr(item, self.config.item_description_field))
+        if not description and isinstance(item, Article):
+            description = Truncator(item.body_text()).words(DESCRIPTION_WORDS)
+        return description
+
+    def item_extra_kwargs(self, item):
+        """
+        The content and image of the item, for the generators.
+        Same as in wagtail_feeds, but reads the config of the request.
+        """
+        image_url = ""
+        if self.config.use_feed_image and item.feed_image:
+            image_url = urljoin(self.site_url, item.feed_image.file.url)
+
+        content_field = getattr(item, self.config.item_content_field)
+        try:
+            content = expand_db_html(content_field)
+        except Exception:
+            content = content_field.__html__()
+
+        soup = BeautifulSoup(content, "html.parser")
+        # Remove style attribute to remove large bottom padding
+        for div in soup.find_all("div", {"class": "responsive-object"}):
+            del div["style"]
+        # Add site url to image source
+        for img_tag in soup.find_all("img"):
+            if img_tag.has_attr("src"):
+                img_tag["src"] = urljoin(self.site_url, img_tag["src"])
+
+        return {
+            "content": soup.prettify(formatter="html"),
+            "image": image_url,
+            "pk": item.pk,
+        }
 
     def __call__(self, request, *args, **kwargs):
         """
         Update the RSS settings from the database,
         so we do not have to restart after each change.
+        They are resolved into a FeedConfig, cached until the settings change.
 
         Set the cache headers as well.
-        The last change of the settings and the articles functions as
-        the Last-Modified header.
+        The content generation (the last change of the settings and the articles)
+        functions as the Last-Modified header.
         It is hashed together with the secret key to get
         a cryptographically secure ETag.
+        Conditional requests matching them are answered with 304 Not Modified
+        without generating the feed.
         """
-        self.feed_settings = ArticlesRSSFeedsSettings.for_request(request)
-        if self.feed_settings is not None:
-            self.title = self.feed_settings.feed_title
-            self.link = self.feed_settings.feed_link
-            self.description = self.feed_settings.feed_description
-            self.author_email = self.feed_settings.feed_author_email
-            self.author_link = self.feed_settings.feed_author_link
-            self.item_description_field = self.feed_settings.feed_item_description_field
-            self.item_content_field = self.feed_settings.feed_item_content_field
-            feeds.feed_model_name = self.feed_settings.feed_model_name
-            feeds.feed_app_label = self.feed_settings.feed_app_label
-            feeds.feed_model = apps.get_model(
-                app_label=self.feed_settings.feed_app_label,
-                model_name=self.feed_settings.feed_model_name,
-            )
-            feeds.use_feed_image = self.feed_settings.feed_image_in_content
-            feeds.feed_item_date_field = self.feed_settings.feed_item_date_field
-            feeds.is_date_field_datetime = (
-                self.feed_settings.is_feed_item_date_field_datetime
-            )
-
-        if request.method == "GET":
-            # Get the feed
-            response = super().__call__(request, *args, **kwargs)
-        elif request.method == "HEAD":
-            # Return just the ETag
-            response = HttpResponse()
-        else:
+        if request.method not in ("GET", "HEAD"):
             return HttpResponseNotAllowed(["HEAD", "GET"])
 
-        # Calculate and set the ETag
-        last_change = max(
-            feeds.feed_model.objects.aggregate(Max("last_published_at"))[
-                "last_published_at__max"
-            ],
-            self.feed_settings.last_changed_at,
-        ).astimezone(datetime.timezone.utc)
+        feed = copy.copy(self)
+        feed.request = request
+        feed.config = FeedConfig.from_settings(
+            setting_for_request(ArticlesRSSFeedsSettings, request)
+        )
+        try:
+            feed.object = feed.lookup_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404("Feed object does not exist.")
+        return feed.serve(request, *args, **kwargs)
+
+    def serve(self, request, *args, **kwargs):
+        """Serve the feed with the config of the request, see __call__."""
+        # Calculate the validators first, so that a client with an up-to-date copy
+        # is answered before any item is queried or any XML is rendered.
+        last_change = content_generation().astimezone(datetime.timezone.utc)
         last_change_http = format_datetime(dt=last_change, usegmt=True)
-        response.headers["Cache-Control"] = "no-cache"
+        # With the microseconds, as there can be several changes within a second
+        etag = quote_etag(
+            hashlib.sha1(
+                (settings.SECRET_KEY + last_change.isoformat()).encode("ascii")
+            ).hexdigest()
+        )
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_change.timestamp())
+        )
+        if response is None:
+            if request.method == "GET":
+                # Get the feed
+                response = self.cached_response(request, etag, *args, **kwargs)
+            else:
+                # Return just the ETag
+                response = HttpResponse()
+
         response.headers["Last-Modified"] = last_change_http
-        response.headers["ETag"] = hashlib.sha1(
-            (settings.SECRET_KEY + last_change_http).encode("ascii")
-        ).hexdigest()
+        if response.has_header("Content-Encoding"):
+            # Encoded representations are not byte-for-byte equal to the original
+            response.headers["ETag"] = "W/" + etag
+        else:
+            response.headers["ETag"] = etag
+        self.set_cache_control(response)
 
         return response
+
+    def cached_response(self, request, etag, *args, **kwargs):
+        """
+        Serve the feed from the cache if it has been generated for the current ETag,
+        without any queries for the items.
+        The feed is cached compressed as well, in each supported encoding.
+
+        Feeds larger than STREAMING_FEED_SIZE are not cached but streamed
+        as they are generated, so they are never in memory as a whole.
+
+        The key uses the site of the request rather than its Host header, which is
+        set by the client, so that the number of entries does not depend on it.
+        Without any site, the feed is not cached either.
+        """
+        site = site_for_request(request)
+        if site is None or self.config.feed_size > STREAMING_FEED_SIZE:
+            return StreamingHttpResponse(
+                (chunk.encode() for chunk in self.stream_feed(self.object)),
+                content_type=self.feed_type.content_type,
+            )
+
+        key = f"articles:feed:{site.pk}:{request.path}:{etag}"
+        cached = cache.get(key)
+        if cached is None:
+            content = "".join(self.stream_feed(self.object)).encode()
+            cached = {
+                "content_type": self.feed_type.content_type,
+                "identity": content,
+                "gzip": gzip.compress(content, mtime=0),
+            }
+            if brotli is not None:
+                cached["br"] = brotli.compress(content)
+            cache.set(key, cached, FEED_CACHE_TIMEOUT)
+
+        accepted = accepted_encodings(request)
+        encoding = next(
+            (
+                encoding
+                for encoding in ("br", "gzip")
+                if encoding in accepted and encoding in cached
+            ),
+            "identity",
+        )
+        response = HttpResponse(cached[encoding], content_type=cached["content_type"])
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+    def set_cache_control(self, response):
+        max_age = self.config.cache_max_age
+        stale_while_revalidate = self.config.cache_stale_while_revalidate
+        if not max_age and not stale_while_revalidate:
+            # Clients have to revalidate each time, which is cheap thanks to the 304s
+            patch_cache_control(response, no_cache=True)
+            return
+
+        patch_cache_control(response, public=True, max_age=max_age)
+        if stale_while_revalidate:
+            patch_cache_control(response, stale_while_revalidate=stale_while_revalidate)
+
+
+class ArticleJSONFeed(ArticleFeed):
+    """The same articles as ArticleFeed, as a JSON Feed."""
+
+    feed_type = ArticleJSONFeedGenerator
+
+
+class TopicFeed(ArticleFeed):
+    """The articles of a topic and its subtopics, by the slug of the topic."""
+
+    def lookup_object(self, request, slug):
+        return ArticleTopic.objects.get(slug=slug)
+
+    def title(self, obj):
+        return f"{self.config.title} - {obj.name}"
+
+    def articles(self, obj):
+        # The articles of the subtopics as well
+        return Article.objects.live().in_topics([obj.slug])
+
+
+class AuthorFeed(ArticleFeed):
+    """The articles of an author, by the id of the author."""
+
+    def lookup_object(self, request, pk):
+        return Author.objects.get(pk=pk)
+
+    def title(self, obj):
+        return f"{self.config.title} - {obj.display_name}"
+
+    def articles(self, obj):
+        # Uses the (author, article) index of the connections
+        return Article.objects.live().filter(authors__author=obj)
+
+
+class SummitFeed(ArticleFeed):
+    """The articles of a summit, by the id of the summit."""
+
+    def lookup_object(self, request, pk):
+        return Summits.objects.get(pk=pk)
+
+    def title(self, obj):
+        return f"{self.config.title} - {obj.name}"
+
+    def articles(self, obj):
+        # Uses the (summit, article) index of the connections
+        return Article.objects.live().filter(summits__summit=obj)
+
+
+class ArticleTypeFeed(ArticleFeed):
+    """The articles of one type (e.g. webinars), by the model name of the type."""
+
+    def lookup_object(self, request, model_name):
+        for model in get_page_models():
+            if issubclass(model, Article) and model._meta.model_name == model_name:
+                return model
+        raise Http404("Unknown article type.")
+
+    def title(self, obj):
+        return f"{self.config.title} - {obj._meta.verbose_name_plural.title()}"
+
+    def articles(self, obj):
+        return obj.objects.live()
+
+
+def accepted_encodings(request) -> Set[str]:
+    encodings = set()
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = part.partition(";")
+        quality = params.replace(" ", "").lower()
+        if quality.startswith("q="):
+            try:
+                if not float(quality[2:]):
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def site_request(site: Site, path: str) -> HttpRequest:
+    """A fake GET request to the path on the site, to generate feeds without a client."""
+    scheme = "https" if site.port == 443 else "http"
+    host = site.hostname if site.port in (80, 443) else f"{site.hostname}:{site.port}"
+    return WSGIRequest(
+        {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "SERVER_NAME": site.hostname,
+            "SERVER_PORT": str(site.port),
+            "HTTP_HOST": host,
+            "wsgi.input": BytesIO(),
+            "wsgi.url_scheme": scheme,
+        }
+    )
+
+
+def cached_feeds() -> Iterator[Tuple[str, ArticleFeed]]:
+    """
+    The path and the feed of each feed URL, for the topics, authors, summits and
+    types which have live articles. The topics without any are kept, as their feeds
+    include the articles of the subtopics.
+    """
+    yield reverse("article_feed"), ArticleFeed()
+    yield reverse("article_json_feed"), ArticleJSONFeed()
+
+    live = Article.objects.live()
+    topic_feed = TopicFeed()
+    for slug in ArticleTopic.objects.values_list("slug", flat=True):
+        yield reverse("topic_feed", kwargs={"slug": slug}), topic_feed
+    author_feed = AuthorFeed()
+    for pk in live.values_list("authors__author", flat=True).distinct():
+        if pk is not None:
+            yield reverse("author_feed", kwargs={"pk": pk}), author_feed
+    summit_feed = SummitFeed()
+    for pk in live.values_list("summits__summit", flat=True).distinct():
+        if pk is not None:
+            yield reverse("summit_feed", kwargs={"pk": pk}), summit_feed
+    type_feed = ArticleTypeFeed()
+    content_types = ContentType.objects.filter(
+        pk__in=live.values("content_type").distinct()
+    )
+    for content_type in content_types:
+        yield (
+            reverse("article_type_feed", kwargs={"model_name": content_type.model}),
+            type_feed,
+        )
+
+
+def regenerate_cached_feeds():
+    """Generate the feeds of each site, so that they are in the cache for the clients."""
+    feeds = list(cached_feeds())
+    for site in Site.objects.all():
+        for path, feed in feeds:
+            feed(site_request(site, path))
+
+
+_regeneration_lock = threading.Lock()
+_regeneration_requested = threading.Event()
+
+
+def _regenerate_until_done():
+    try:
+        while _regeneration_requested.is_set():
+            _regeneration_requested.clear()
+            try:
+                regenerate_cached_feeds()
+            except Exception:
+                logger.exception("Could not regenerate the cached feeds")
+    finally:
+        connection.close()
+        _regeneration_lock.release()
+    # A request may have come after the loop ended but before the lock was released
+    if _regeneration_requested.is_set() and _regeneration_lock.acquire(blocking=False):
+        _regenerate_until_done()
+
+
+def regenerate_cached_feeds_in_background():
+    """
+    Regenerate the feeds in a background thread. Requests made while a regeneration
+    is running are coalesced into a single extra run.
+    """
+    _regeneration_requested.set()
+    if _regeneration_lock.acquire(blocking=False):
+        threading.Thread(target=_regenerate_until_done, daemon=True).start()
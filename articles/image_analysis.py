@@ -0,0 +1,169 @@
+"""
+Finds the images of the library to clean up: duplicates and auto-named images.
+
+For each image a checksum of the file and a perceptual hash (a difference hash of
+a small grayscale thumbnail) are stored in ImageAnalysis. Images with the same
+checksum, or the same perceptual hash and the same dimensions, are flagged as
+duplicates, and images whose title was taken from the file name, or looks like the
+name given by a camera or a screenshot tool, as untitled. Both flags are indexed,
+so the admin can filter by them without opening any file.
+
+The images are analyzed by an analyze_images job queued after they have been
+saved, see jobs, and by the analyze_images command for the existing library.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from PIL import Image as PILImage
+from tqdm import tqdm
+from wagtail.images import get_image_model
+from wagtail.images.exceptions import SourceImageIOError
+
+from .models import ImageAnalysis
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# The size of the thumbnail, one column wider to compare each pixel with the next
+HASH_SIZE = 8
+# Hashes with fewer bits set, or unset, are shared by unrelated flat or
+# solid images (a blank image hashes to 0), so they are not compared
+MIN_HASH_BITS = 8
+
+# E.g. "IMG_1234", "DSC01234", "Screenshot 2022-05-01 at 10.15.00", "image (3)"
+AUTO_NAME_RE = re.compile(
+    r"^(?:img|image|dsc[fn]?|pxl|photo|pic|screenshot|screen shot|untitled|unnamed)?"
+    r"(?:[\W_]*\d[\d\W_]*)?(?:\s*at\s[\d\W_]+)?$",
+    re.IGNORECASE,
+)
+
+
+def perceptual_hash(file) -> Optional[str]:
+    """
+    The difference hash of the image as 16 hex digits,
+    if Pillow can read it and the image is not nearly flat.
+    """
+    try:
+        with PILImage.open(file) as image:
+            resample = getattr(PILImage, "Resampling", PILImage).LANCZOS
+            pixels = list(
+                image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), resample).getdata()
+            )
+    except (OSError, ValueError, PILImage.DecompressionBombError):
+        # E.g. an SVG or a damaged file, still compared by its checksum
+        return None
+    bits = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + column
+            bits = bits << 1 | (pixels[offset] > pixels[offset + 1])
+    bit_count = bin(bits).count("1")
+    if not MIN_HASH_BITS <= bit_count <= HASH_SIZE * HASH_SIZE - MIN_HASH_BITS:
+        # Still compared by its checksum
+        return None
+    return f"{bits:016x}"
+
+
+def checksum(file) -> str:
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def is_untitled(title: str, file_name: str) -> bool:
+    title = title.strip()
+    if not title:
+        return True
+    # The title given by the multiple upload is the file name without the extension
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    return title.lower() in name.lower() or bool(AUTO_NAME_RE.match(title))
+
+
+def analyze_image(image) -> Optional[ImageAnalysis]:
+    try:
+        with image.open_file() as file:
+            file_checksum = checksum(file)
+            file.seek(0)
+            file_hash = perceptual_hash(file)
+    except (SourceImageIOError, OSError):
+        logger.warning("Could not read the file of the image %s", image.pk)
+        return None
+    analysis, _created = ImageAnalysis.objects.update_or_create(
+        image=image,
+        defaults={
+            "file_name": image.file.name,
+            "checksum": file_checksum,
+            "perceptual_hash": file_hash or "",
+            "is_untitled": is_untitled(image.title, image.file.name),
+        },
+    )
+    return analysis
+
+
+def pending_images():
+    """The images which have not been analyzed since their file was replaced."""
+    return get_image_model().objects.filter(
+        Q(analysis__isnull=True) | ~Q(analysis__file_name=F("file"))
+    )
+
+
+def update_duplicates():
+    """
+    Flag the images sharing their checksum with another one, or their perceptual
+    hash with another one of the same width and height.
+    """
+    checksums = (
+        ImageAnalysis.objects.values("checksum")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+        .values("checksum")
+    )
+    similar = ImageAnalysis.objects.filter(
+        perceptual_hash=OuterRef("perceptual_hash"),
+        image__width=OuterRef("image__width"),
+        image__height=OuterRef("image__height"),
+    ).exclude(pk=OuterRef("pk"))
+    similar_pks = (
+        ImageAnalysis.objects.exclude(perceptual_hash="")
+        .filter(Exists(similar))
+        .values("pk")
+    )
+    duplicate = Q(checksum__in=checksums) | Q(pk__in=similar_pks)
+    with transaction.atomic():
+        ImageAnalysis.objects.filter(duplicate, is_duplicate=False).update(is_duplicate=True)
+        ImageAnalysis.objects.exclude(duplicate).filter(is_duplicate=True).update(
+            is_duplicate=False
+        )
+
+
+def analyze_images(queryset=None, progress: bool = False) -> int:
+    """
+    Analyze the images of the queryset, the pending images by default.
+
+    :return: The number of analyzed images.
+    """
+    if queryset is None:
+        queryset = pending_images()
+    analyzed = 0
+    for image in tqdm(queryset.iterator(), disable=not progress):
+        if analyze_image(image) is not None:
+            analyzed += 1
+    if analyzed:
+        update_duplicates()
+    return analyzed
+
+
+def update_title_flag(image):
+    """After the title of an image has changed, without reading the file again."""
+    ImageAnalysis.objects.filter(image=image).update(
+        is_untitled=is_untitled(image.title, image.file.name)
+    )
+
@@ -0,0 +1,57 @@
+"""
+Usage counts of images for a whole page of the image library at once.
+
+Image.get_usage builds a union of subqueries over every relation to the image, so
+counting it for each image of the index runs several queries per thumbnail.
+The counts here follow the same relations as wagtail.admin.models.get_object_usage,
+but with one query per relation for all the images together.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple
+
+from django.db.models import Model
+from modelcluster.fields import ParentalKey
+from wagtail.core.models import Page
+
+
+def usage_relations(model) -> Iterable[Tuple[type, str, str]]:
+    """(related model, field pointing to the object, field pointing to the page)"""
+    for relation in model._meta.get_fields(include_hidden=True):
+        if not ((relation.one_to_many or relation.one_to_one) and relation.auto_created):
+            continue
+        related_model = relation.related_model
+        if issubclass(related_model, Page):
+            yield related_model, relation.field.attname, "id"
+            continue
+        for field in related_model._meta.fields:
+            if isinstance(field, ParentalKey) and issubclass(field.remote_field.model, Page):
+                yield related_model, relation.field.attname, field.attname
+
+
+def usage_counts(model, pks: Iterable[int]) -> Dict[int, int]:
+    """The number of distinct pages using each of the objects, as get_usage().count()."""
+    pks = list(pks)
+    pages: Dict[int, Set[int]] = defaultdict(set)
+    if not pks:
+        return {}
+    for related_model, object_field, page_field in usage_relations(model):
+        rows = (
+            related_model._base_manager.filter(**{f"{object_field}__in": pks})
+            .exclude(**{f"{page_field}__isnull": True})
+            .values_list(object_field, page_field)
+            .distinct()
+        )
+        for object_pk, page_pk in rows:
+            pages[object_pk].add(page_pk)
+    return {pk: len(pages[pk]) for pk in pks}
+
+
+def set_usage_counts(objects: Iterable[Model]):
+    """Set usage_count on each of the objects, e.g. the images of a page of the index."""
+    objects = list(objects)
+    if not objects:
+        return
+    counts = usage_counts(type(objects[0]), [obj.pk for obj in objects])
+    for obj in objects:
+        obj.usage_count = counts[obj.pk]
@@ -0,0 +1,136 @@
+"""
+A job queue in the database for the bulk operations started from the admin.
+
+The admin enqueues a Job with the name of a registered function and its arguments,
+and returns at once. The run_jobs command claims the oldest queued job with a
+conditional update, so several workers never run the same job, and runs it. The
+function reports its progress through the job and returns the message for the
+editors, which the Jobs admin shows with the status.
+"""
+
+import logging
+import traceback
+from typing import Callable, Dict, Optional
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .image_analysis import analyze_images
+from .models import Article, Job, get_generate
+from .page_urls import update_urls
+
+logger = logging.getLogger(__name__)
+
+JobFunction = Callable[..., str]
+
+registry: Dict[str, JobFunction] = {}
+
+
+def register_job(name: str) -> Callable[[JobFunction], JobFunction]:
+    """
+    Register a function to run as a job, e.g. @register_job("generate_topics").
+    It is called with the Job and the keyword arguments given to enqueue.
+    """
+
+    def register(function: JobFunction) -> JobFunction:
+        registry[name] = function
+        return function
+
+    return register
+
+
+def enqueue(name: str, user=None, **arguments) -> Job:
+    if name not in registry:
+        raise KeyError(f"No job is registered as {name!r}")
+    return Job.objects.create(name=name, arguments=arguments, created_by=user)
+
+
+def enqueue_once(name: str, user=None, **arguments) -> Job:
+    """Enqueue the job unless the same job is already waiting, e.g. from a signal handler."""
+    job = Job.objects.filter(name=name, arguments=arguments, status=Job.QUEUED).first()
+    if job is not None:
+        return job
+    return enqueue(name, user, **arguments)
+
+
+def claim_next_job() -> Optional[Job]:
+    """The oldest queued job, marked as running for this worker."""
+    while True:
+        job = Job.objects.filter(status=Job.QUEUED).order_by("created_at", "pk").first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker has claimed it meanwhile
+
+
+def run_job(job: Job):
+    try:
+        function = registry[job.name]
+        job.result = function(job, **job.arguments) or ""
+        job.status = Job.DONE
+    except Exception:
+        logger.exception("The job %s has failed", job)
+        job.result = traceback.format_exc()
+        job.status = Job.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["result", "status", "finished_at"])
+
+
+def run_jobs(
+    stop_when_empty: bool = False, wait: Optional[Callable[[], None]] = None
+) -> int:
+    """
+    Run the queued jobs one after another.
+
+    :param stop_when_empty: Return when there is no queued job, instead of waiting.
+    :param wait: Called when there is no queued job, e.g. to sleep before polling again.
+    :return: The number of jobs run.
+    """
+    count = 0
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+        if job is None:
+            if stop_when_empty or wait is None:
+                return count
+            wait()
+            continue
+        run_job(job)
+        count += 1
+
+
+def requeue_interrupted_jobs() -> int:
+    """Queue the jobs left running by a worker which has been stopped, e.g. by a deploy."""
+    return Job.objects.filter(status=Job.RUNNING).update(
+        status=Job.QUEUED, started_at=None, progress=0, total=None
+    )
+
+
+# ******************************
+# **           Jobs           **
+# ******************************
+
+
+@register_job("generate_topics")
+def generate_topics(job: Job, instance_pk: int) -> str:
+    count = get_generate(instance_pk, progress=job.set_progress)
+    if count > 0:
+        return f"Added in {count} Articles"
+    return "Don`t added Topic"
+
+
+@register_job("update_article_urls")
+def update_article_urls(job: Job) -> str:
+    count = update_urls(Article.objects.all())
+    return f"Updated the URLs of {count} Articles"
+
+
+@register_job("analyze_images")
+def analyze_pending_images(job: Job) -> str:
+    count = analyze_images()
+    return f"Analyzed {count} images"
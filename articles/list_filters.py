@@ -0,0 +1,70 @@
+"""
+List filters of the article admins whose choices are cached.
+
+The choices of the filters are read from the database on every load of a list,
+although they rarely change. They are cached under a version, which is bumped by
+the signal handlers when articles are published or the filtered objects change.
+The version is kept in the cache shared by all the processes (see CACHES in the
+settings), so a change made in one process is seen by the others at once.
+"""
+
+import uuid
+from typing import Callable, List, Tuple
+
+from django.contrib.admin import RelatedFieldListFilter, SimpleListFilter
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+CACHE_TIMEOUT = 60 * 60 * 24
+VERSION_CACHE_KEY = "articles:list_filters:version"
+
+
+def cached_choices(key: str, load: Callable[[], List[Tuple]]) -> List[Tuple]:
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return cache.get_or_set(f"articles:list_filters:{version}:{key}", load, CACHE_TIMEOUT)
+
+
+def invalidate_list_filters():
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+class YearFilter(SimpleListFilter):
+
+    title = 'Years'
+    parameter_name = 'first_published_at__year'
+
+    def lookups(self, request, model_admin):
+        return cached_choices(
+            f"years:{model_admin.model._meta.label_lower}",
+            lambda: self.load_lookups(model_admin.model),
+        )
+
+    @staticmethod
+    def load_lookups(model):
+        all_years = model.objects.filter(~Q(first_published_at__year=None)).values('first_published_at__year').annotate(cnt=Count('first_published_at__year')).order_by('-first_published_at__year')
+        return [
+            (x['first_published_at__year'], f"{x['first_published_at__year']} ({x['cnt']})")
+            for x in all_years
+        ]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        return queryset.filter(first_published_at__year=self.value())
+
+
+class CachedRelatedFieldListFilter(RelatedFieldListFilter):
+    """
+    E.g. ("topics__topic", CachedRelatedFieldListFilter) in list_filter.
+    The choices are shared by all the admins filtering by the same field.
+    """
+
+    def field_choices(self, field, request, model_admin):
+        load = super().field_choices
+        return cached_choices(
+            f"related:{field.model._meta.label_lower}.{field.name}",
+            lambda: list(load(field, request, model_admin)),
+        )
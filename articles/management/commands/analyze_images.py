@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from wagtail.images import get_image_model
+
+from articles.image_analysis import analyze_images, pending_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Calculates the checksums and perceptual hashes of the images which have "
+        "not been analyzed yet, and flags the duplicate and untitled images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Analyze all images again."
+        )
+
+    def handle(self, *args, **options):
+        images = get_image_model().objects.all() if options["all"] else pending_images()
+        analyzed = analyze_images(images, progress=True)
+        self.stdout.write(f"Analyzed {analyzed} images.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from articles.reading_time import calculate_all
+
+
+class Command(BaseCommand):
+    help = "Calculates the reading times of all articles, caching the texts of their bodies."
+
+    def handle(self, *args, **options):
+        results = calculate_all(progress=True)
+        self.stdout.write(f"Calculated the reading time of {len(results)} articles.")
@@ -0,0 +1,268 @@
+"""
+Runs content filters over the whole article archive in parallel.
+
+The article ids are split into contiguous ranges which are processed by a pool of
+worker processes, each with its own database connection. All selected filters are
+applied to an article in a single visit and the article is saved at most once.
+"""
+
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from tqdm import tqdm
+
+from articles.content_filters import (
+    AMPFilter,
+    ArticleBodyRichTexts,
+    ArticleExcerpt,
+    ArticleTitle,
+    ContentFilter,
+    ContentLocator,
+    FilterChain,
+    NBSPFilter,
+    ShortcodeFilterInboundButton,
+)
+from articles.feeds import bump_item_generation
+from articles.models import Article, ArticleBodyBackup
+
+logger = logging.getLogger(__name__)
+
+FILTERS: Dict[str, Type[ContentFilter]] = {
+    "nbsp": NBSPFilter,
+    "amp": AMPFilter,
+    "inbound_button": ShortcodeFilterInboundButton,
+}
+
+LOCATORS: Dict[str, Type[ContentLocator]] = {
+    "title": ArticleTitle,
+    "excerpt": ArticleExcerpt,
+    "body": ArticleBodyRichTexts,
+}
+
+
+def build_filter(filter_names: Sequence[str], replace_with: Optional[str]) -> FilterChain:
+    return FilterChain([FILTERS[name](replace_with) for name in filter_names])
+
+
+def filter_article(
+    article: Article,
+    content_filter: FilterChain,
+    locator_names: Sequence[str],
+    dry_run: bool,
+) -> List[str]:
+    """
+    Runs the filters over every selected part of the article in a single visit.
+    Saves the article if anything has changed, backing up the body first.
+
+    :return: The names of the changed fields.
+    """
+    raw_body = list(article.body.raw_data)
+    changed_fields = content_filter.filter_article(
+        article, [LOCATORS[name] for name in locator_names]
+    )
+
+    if changed_fields and not dry_run:
+        with transaction.atomic():
+            if "body" in changed_fields:
+                ArticleBodyBackup.backup(article, body=raw_body)
+            article.save(update_fields=changed_fields)
+
+    return changed_fields
+
+
+def filter_id_range(
+    first_id: int,
+    last_id: int,
+    filter_names: Sequence[str],
+    replace_with: Optional[str],
+    locator_names: Sequence[str],
+    dry_run: bool,
+) -> List[Dict]:
+    """
+    Worker entry point. Filters all the articles with ids in the inclusive range.
+    An article which cannot be filtered is reported with its error and skipped.
+    """
+    content_filter = build_filter(filter_names, replace_with)
+    articles = Article.objects.filter(pk__gte=first_id, pk__lte=last_id).order_by("pk")
+    changes = []
+    for article in articles.iterator():
+        try:
+            changed_fields = filter_article(article, content_filter, locator_names, dry_run)
+        except Exception as e:
+            logger.exception("Could not filter the article %s", article.pk)
+            changes.append({"id": article.pk, "error": f"{type(e).__name__}: {e}"})
+            continue
+        if changed_fields:
+            changes.append({"id": article.pk, "fields": changed_fields})
+    return changes
+
+
+def init_worker():
+    # Workers started with "spawn" instead of "fork" begin with an unconfigured Django.
+    if not apps.ready:
+        django.setup()
+
+
+def partition_ids(ids: Sequence[int], chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Splits sorted ids into inclusive (first, last) ranges of at most chunk_size ids."""
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        yield chunk[0], chunk[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs content filters over the title, excerpt and body of all articles "
+        "using multiple processes and writes a JSON report of the changed articles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "filters",
+            nargs="+",
+            choices=sorted(FILTERS),
+            help="Filters to apply, in the given order.",
+        )
+        parser.add_argument(
+            "--locator",
+            action="append",
+            dest="locators",
+            choices=sorted(LOCATORS),
+            help="Part of the article to filter. Can be repeated. Defaults to all.",
+        )
+        parser.add_argument(
+            "--replace-with",
+            default=None,
+            help="Replacement string passed to the filters.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes. Defaults to the number of CPUs.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of articles processed by a worker at a time.",
+        )
+        parser.add_argument(
+            "--report",
+            default="-",
+            help="Path of the JSON report. Defaults to the standard output.",
+        )
+        parser.add_argument(
+            "--estimate",
+            type=int,
+            metavar="SAMPLE_SIZE",
+            help="Only estimate the impact of the filters on a random sample of "
+            "articles, without changing anything.",
+        )
+        parser.add_argument(
+            "--diffs",
+            action="store_true",
+            help="Include unified diffs of the sampled articles in the estimate.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Seed of the random sample of the estimate, to compare several runs.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Do not save the articles, only report what would change.",
+        )
+
+    def handle(self, *args, **options):
+        filter_names = options["filters"]
+        locator_names = options["locators"] or list(LOCATORS)
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be a positive number.")
+
+        if options["estimate"] is not None:
+            report = self.estimate(filter_names, locator_names, options)
+            self.write_report(report, options["report"])
+            return
+
+        ids = list(Article.objects.order_by("pk").values_list("pk", flat=True))
+        ranges = list(partition_ids(ids, options["chunk_size"]))
+        job_args = (filter_names, options["replace_with"], locator_names, options["dry_run"])
+
+        changes = []
+        progress = tqdm(total=len(ranges), unit="chunk", file=sys.stderr)
+        if options["workers"] == 1:
+            for first_id, last_id in ranges:
+                changes += filter_id_range(first_id, last_id, *job_args)
+                progress.update()
+        else:
+            # Forked workers must not inherit the connection of the parent process.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["workers"], initializer=init_worker
+            ) as executor:
+                futures = [
+                    executor.submit(filter_id_range, first_id, last_id, *job_args)
+                    for first_id, last_id in ranges
+                ]
+                for future in as_completed(futures):
+                    changes += future.result()
+                    progress.update()
+        progress.close()
+
+        changes.sort(key=lambda change: change["id"])
+        errors = [change for change in changes if "error" in change]
+        changed = [change for change in changes if "error" not in change]
+        report = {
+            "filters": filter_names,
+            "locators": locator_names,
+            "dry_run": options["dry_run"],
+            "processed": len(ids),
+            "changed": changed,
+            "errors": errors,
+        }
+        if changed and not options["dry_run"]:
+            # The articles are saved without being published again
+            bump_item_generation()
+        self.write_report(report, options["report"])
+        self.stderr.write(f"{len(changed)} of {len(ids)} articles changed.")
+        if errors:
+            self.stderr.write(f"{len(errors)} articles could not be filtered, see the report.")
+
+    @staticmethod
+    def estimate(filter_names, locator_names, options) -> Dict:
+        content_filter = build_filter(filter_names, options["replace_with"])
+        return {
+            "filters": filter_names,
+            "estimates": {
+                name: LOCATORS[name]
+                .estimate(
+                    Article.objects.all(),
+                    content_filter,
+                    sample_size=options["estimate"],
+                    with_diffs=options["diffs"],
+                    seed=options["seed"],
+                    workers=options["workers"] or os.cpu_count() or 1,
+                )
+                .as_dict()
+                for name in locator_names
+            },
+        }
+
+    def write_report(self, report: Dict, path: str):
+        if path == "-":
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            with open(path, "w") as report_file:
+                json.dump(report, report_file, indent=2)
+            self.stderr.write(f"Report written to {path}.")
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from articles.jobs import requeue_interrupted_jobs, run_jobs
+
+
+class Command(BaseCommand):
+    help = "Runs the jobs queued from the admin, e.g. the topic generation."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the queued jobs and exit, instead of waiting for new ones.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="The seconds to wait before looking for new jobs again.",
+        )
+        parser.add_argument(
+            "--requeue",
+            action="store_true",
+            help=(
+                "Queue the jobs left running by a stopped worker again first. "
+                "Only use it when no other worker is running."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue"]:
+            requeued = requeue_interrupted_jobs()
+            self.stdout.write(f"Queued {requeued} interrupted jobs again.")
+        poll_interval = options["poll_interval"]
+        count = run_jobs(
+            stop_when_empty=options["once"],
+            wait=lambda: time.sleep(poll_interval),
+        )
+        self.stdout.write(f"Ran {count} jobs.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from articles.models import Article
+from articles.page_urls import update_urls
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculates the precomputed URLs of all articles, "
+        "e.g. after the sites have changed."
+    )
+
+    def handle(self, *args, **options):
+        updated = update_urls(Article.objects.all(), progress=True)
+        self.stdout.write(f"Updated the URLs of {updated} articles.")
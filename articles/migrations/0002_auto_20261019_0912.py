@@ -0,0 +1,23 @@
+# Generated by Django 3.2.13 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articlesrssfeedssettings',
+            name='cache_max_age',
+            field=models.PositiveIntegerField(default=0, help_text='For how many seconds can feed readers and proxies use a copy of the feed without asking whether it has changed. 0 means they have to ask every time.', verbose_name='Cache max age'),
+        ),
+        migrations.AddField(
+            model_name='articlesrssfeedssettings',
+            name='cache_stale_while_revalidate',
+            field=models.PositiveIntegerField(default=0, help_text='For how many seconds after the max age can a stale copy of the feed be served while it is being revalidated in the background.', verbose_name='Cache stale while revalidate'),
+        ),
+    ]
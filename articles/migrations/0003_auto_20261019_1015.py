@@ -0,0 +1,25 @@
+# Generated by Django 3.2.13 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0002_auto_20261019_0912'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articleauthorsorderable',
+            index=models.Index(fields=['author', 'article'], name='articles_author_article_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articlesummitsconnection',
+            index=models.Index(fields=['summit', 'article'], name='articles_summit_article_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articletopicconnection',
+            index=models.Index(fields=['topic', 'article'], name='articles_topic_article_idx'),
+        ),
+    ]
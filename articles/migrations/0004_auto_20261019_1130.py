@@ -0,0 +1,23 @@
+# Generated by Django 3.2.13 on 2026-10-19 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_auto_20261019_1015'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='cached_full_url',
+            field=models.CharField(blank=True, editable=False, max_length=2048),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='cached_url',
+            field=models.CharField(blank=True, editable=False, max_length=2048),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.13 on 2026-10-19 12:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailimages', '0023_add_choose_permissions'),
+        ('articles', '0004_auto_20261019_1130'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAnalysis',
+            fields=[
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analysis', serialize=False, to='wagtailimages.image')),
+                ('file_name', models.CharField(editable=False, max_length=255)),
+                ('checksum', models.CharField(db_index=True, editable=False, max_length=64)),
+                ('perceptual_hash', models.CharField(blank=True, db_index=True, editable=False, max_length=16)),
+                ('is_duplicate', models.BooleanField(db_index=True, default=False, editable=False, verbose_name='duplicate')),
+                ('is_untitled', models.BooleanField(db_index=True, default=False, editable=False, verbose_name='untitled')),
+                ('analyzed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Image analyses',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.13 on 2026-10-19 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_self_links(apps, schema_editor):
+    ArticleTopic = apps.get_model("articles", "ArticleTopic")
+    ArticleTopicClosure = apps.get_model("articles", "ArticleTopicClosure")
+    ArticleTopicClosure.objects.bulk_create(
+        [
+            ArticleTopicClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+            for pk in ArticleTopic.objects.values_list("pk", flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0006_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articletopic',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='The articles with this topic are also listed under the parent topic.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='articles.articletopic'),
+        ),
+        migrations.CreateModel(
+            name='ArticleTopicClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='articles.articletopic')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='articles.articletopic')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='articletopicclosure',
+            index=models.Index(fields=['descendant', 'ancestor'], name='articles_topic_descendant_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='articletopicclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='articles_topic_closure_unique'),
+        ),
+        migrations.RunPython(create_self_links, migrations.RunPython.noop),
+    ]
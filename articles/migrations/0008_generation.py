@@ -0,0 +1,20 @@
+# Generated by Django 3.2.13 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0007_topic_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Generation',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
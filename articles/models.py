@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import json
 from functools import cached_property
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 import graphene
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.html import mark_safe
 from django.shortcuts import get_object_or_404
@@ -36,7 +38,8 @@ from wagtail.admin.edit_handlers import (
 )
 from wagtail.core import blocks
 from wagtail.core.fields import RichTextField, StreamField
-from wagtail.core.models import Orderable, Page
+from wagtail.core.models import BasePageManager, Orderable, Page
+from wagtail.core.query import PageQuerySet
 from wagtail.embeds.blocks import EmbedBlock
 from wagtail.images.edit_handlers import ImageChooserPanel
 from wagtail.search import index
@@ -55,6 +58,8 @@ from .blocks import (
     RelatedContentBlock,
     RichTextBlock,
 )
+from .process_cache import setting_for_request
+from .search_index import reindex_pages
 
 # Models declared in settings.py
 from .settings import ArticlesRSSFeedsSettings, ArticleTypesSettings  # noqa
@@ -65,7 +70,7 @@ from .settings import ArticlesRSSFeedsSettings, ArticleTypesSettings  # noqa
 from .widgets import AdminTimezoneDateTimeInput
 
 from wagtailorderable.models import Orderable as WagOrderable
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 @register_snippet
@@ -304,13 +309,33 @@ class ArticleTopic(index.Indexed, models.Model):
 
     name = models.CharField(max_length=127, unique=True)
     slug = models.SlugField(max_length=127, unique=True)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="children",
+        help_text="The articles with this topic are also listed under the parent topic.",
+    )
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.parent_id is None or self.pk is None:
+            return
+        if ArticleTopicClosure.objects.filter(ancestor=self, descendant_id=self.parent_id).exists():
+            raise ValidationError({"parent": "A topic cannot be below itself."})
+
     def save(self, *args, **kwargs):
         self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        moved = self.pk is None or not ArticleTopic.objects.filter(
+            pk=self.pk, parent_id=self.parent_id
+        ).exists()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                ArticleTopicClosure.move(self)
 
     graphql_fields = [GraphQLString("name"), GraphQLString("slug")]
 
@@ -319,6 +344,47 @@ class ArticleTopic(index.Indexed, models.Model):
     ]
 
 
+class ArticleTopicClosure(models.Model):
+    """
+    Every ancestor of every topic, including the topic itself at depth 0,
+    so that the descendants of topics are found with a single indexed join.
+    Maintained by ArticleTopic.save.
+    """
+
+    ancestor = models.ForeignKey(ArticleTopic, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(ArticleTopic, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["ancestor", "descendant"], name="articles_topic_closure_unique")
+        ]
+        indexes = [models.Index(fields=["descendant", "ancestor"], name="articles_topic_descendant_idx")]
+
+    @classmethod
+    def move(cls, topic: ArticleTopic):
+        """Link the topic and its descendants to the ancestors of its current parent."""
+        cls.objects.get_or_create(ancestor=topic, descendant=topic, defaults={"depth": 0})
+        subtree = list(cls.objects.filter(ancestor=topic).values_list("descendant_id", "depth"))
+        subtree_ids = [descendant_id for descendant_id, _depth in subtree]
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if topic.parent_id is None:
+            return
+        ancestors = cls.objects.filter(descendant_id=topic.parent_id).values_list("ancestor_id", "depth")
+        cls.objects.bulk_create(
+            [
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, depth in subtree
+            ]
+        )
+
+    @classmethod
+    def descendant_ids(cls, slugs: List[str]) -> models.QuerySet:
+        """The ids of the topics with the slugs and of all their descendants."""
+        return cls.objects.filter(ancestor__slug__in=slugs).values("descendant_id")
+
+
 @register_snippet
 @register_singular_query_field("source")
 @register_plural_query_field("sources")
@@ -541,6 +607,9 @@ class WebinarEventSpeakerConnection(models.Model):
 
 
 class ArticleAuthorsOrderable(Orderable):
+    class Meta(Orderable.Meta):
+        indexes = [models.Index(fields=["author", "article"], name="articles_author_article_idx")]
+
     article = ParentalKey("articles.Article", related_name="authors")
     author = models.ForeignKey(Author, related_name="articles", on_delete=models.CASCADE)
     panels = [SnippetChooserPanel("author")]
@@ -560,6 +629,9 @@ class ArticleAuthorsOrderable(Orderable):
 
 
 class ArticleTopicConnection(Orderable):
+    class Meta(Orderable.Meta):
+        indexes = [models.Index(fields=["topic", "article"], name="articles_topic_article_idx")]
+
     article = ParentalKey("Article", related_name="topics")
     topic = models.ForeignKey(ArticleTopic, on_delete=models.CASCADE)
     panels = [SnippetChooserPanel("topic")]
@@ -626,6 +698,9 @@ class ArticleVerticalConnection(models.Model):
 
 
 class ArticleSummitsConnection(Orderable):
+    class Meta(Orderable.Meta):
+        indexes = [models.Index(fields=["summit", "article"], name="articles_summit_article_idx")]
+
     article = ParentalKey("Article", related_name="summits")
     summit = models.ForeignKey(Summits, on_delete=models.CASCADE)
     panels = [SnippetChooserPanel("summit")]
@@ -828,9 +903,27 @@ class MarketoMixin(models.Model):
     ]
 
 
+class ArticleQuerySet(PageQuerySet):
+    def in_topics(self, slugs: List[str]) -> ArticleQuerySet:
+        """
+        The articles with any of the topics, or with a descendant of them,
+        through ArticleTopicClosure. Added to the other filters of the queryset.
+        """
+        return self.filter(
+            # A subquery, so that articles with several of the topics are not repeated
+            models.Exists(
+                ArticleTopicConnection.objects.filter(
+                    article_id=models.OuterRef("pk"),
+                    topic__in=ArticleTopicClosure.descendant_ids(slugs),
+                )
+            )
+        )
+
+
 @register_singular_query_field("article")
 @register_plural_query_field(
     "articles",
+    # Resolved by CustomQuery.resolve_articles, see queries.py
     query_params=dict(
         topics__topic__id=graphene.Int(),
         topics__topic__slug__in=graphene.List(graphene.String),
@@ -843,6 +936,8 @@ class Article(Page):
     parent_page_types = ["articles.ArticleContainer"]
     subpage_types: List[str] = []
 
+    objects = BasePageManager.from_queryset(ArticleQuerySet)()
+
     thumbnail = models.ForeignKey(
         "wagtailimages.Image", on_delete=models.PROTECT, null=True, blank=True
     )
@@ -874,6 +969,12 @@ class Article(Page):
         null=True,
         help_text='if the field is empty then calculation is done automatically'
     )
+    # Page.url and Page.full_url, precomputed on publish, move and slug change.
+    # See page_urls.
+    cached_url = models.CharField(max_length=2048, blank=True, editable=False)
+    cached_full_url = models.CharField(max_length=2048, blank=True, editable=False)
+    # A copy is at another URL, and gets its own when it is published
+    exclude_fields_in_copy = ["cached_url", "cached_full_url"]
 
     content_panels = Page.content_panels + [
         FieldPanel("first_published_at"),
@@ -922,16 +1023,38 @@ class Article(Page):
         if self.specific_class is None:
             return None
         attribute = f"{self.specific_class._meta.model_name}_icon"
-        settings = ArticleTypesSettings.for_request(info.context)
+        settings = setting_for_request(ArticleTypesSettings, info.context)
         return getattr(settings, attribute)
 
+    @property
+    def url(self):
+        return self.cached_url or self.get_url()
+
+    @property
+    def full_url(self):
+        return self.cached_full_url or self.get_full_url()
+
     @property
     def feed_image(self):
         """Define the image for the Atom feed."""
         return self.thumbnail
 
+    @property
+    def reading_time(self) -> str:
+        """
+        The indicator of time set by the editors, or if empty,
+        the reading time calculated from the content.
+        """
+        if self.indicator_of_time:
+            return self.indicator_of_time
+
+        from .reading_time import reading_time
+
+        return reading_time(self)
+
     graphql_fields = [
         GraphQLString("indicator_of_time"),
+        GraphQLString("reading_time"),
         GraphQLImage("thumbnail"),
         GraphQLString("excerpt"),
         GraphQLStreamfield("body"),
@@ -965,11 +1088,20 @@ class Article(Page):
         """For indexing."""
         return self.thumbnail.file.url if self.thumbnail else None
 
+    def body_text(self) -> str:
+        """
+        The body as plain text, without the markup and shortcodes.
+        Used for indexing and the RSS item descriptions.
+        """
+        from .text import body_text
+
+        return body_text(self.body.raw_data)
+
     search_fields = Page.search_fields + [
         FilterField("thumbnail_url"),
         FilterField("full_url"),
         SearchField("excerpt"),
-        SearchField("body"),
+        SearchField("body_text"),
         FilterField("content_type_name"),
         RelatedFields("authors", [SearchField("author_display_name")]),
         RelatedFields("topics", [SearchField("topic_name")]),
@@ -1157,7 +1289,11 @@ class VideoDTW(Article, WagOrderable):
         return self.sort_order
 
     def get_summit(self):
-        return self.summits.get().summit_logo()
+        # all() instead of get(), so that the summits prefetched by the admin are used
+        connections = list(self.summits.all())
+        if not connections:
+            raise ArticleSummitsConnection.DoesNotExist
+        return connections[0].summit_logo()
 
     def is_video_file(self):
         if self.video_dtw_name:
@@ -1251,9 +1387,13 @@ class ArticleBodyBackup(models.Model):
     body = models.JSONField()
 
     @classmethod
-    def backup(cls, article: Article) -> ArticleBodyBackup:
+    def backup(cls, article: Article, body: Optional[list] = None) -> ArticleBodyBackup:
+        """
+        :param body: The raw data of the body to back up, if the body of the article
+        has already been changed in memory.
+        """
         return ArticleBodyBackup.objects.create(
-            article=article, body=list(article.body.raw_data)
+            article=article, body=list(article.body.raw_data) if body is None else body
         )
 
     def restore(self):
@@ -1262,6 +1402,124 @@ class ArticleBodyBackup(models.Model):
         article.body = json.dumps(self.body)
         article.save(update_fields=["body"])
 
+        from .feeds import bump_item_generation
+
+        transaction.on_commit(bump_item_generation)
+
+
+class ImageAnalysis(models.Model):
+    """
+    The hashes of the file of an image and the cleanup flags derived from them,
+    calculated in the background by image_analysis.analyze_images.
+    """
+
+    image = models.OneToOneField(
+        "wagtailimages.Image",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="analysis",
+    )
+    # The name of the analyzed file, to notice when the file has been replaced
+    file_name = models.CharField(max_length=255, editable=False)
+    checksum = models.CharField(max_length=64, db_index=True, editable=False)
+    perceptual_hash = models.CharField(max_length=16, blank=True, db_index=True, editable=False)
+    is_duplicate = models.BooleanField("duplicate", default=False, db_index=True, editable=False)
+    is_untitled = models.BooleanField("untitled", default=False, db_index=True, editable=False)
+    analyzed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Image analyses"
+
+    def __str__(self):
+        return str(self.image)
+
+
+class Job(models.Model):
+    """
+    A bulk operation queued from the admin and run by the run_jobs command,
+    see jobs.py for the registered operations.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=255, editable=False)
+    arguments = models.JSONField(default=dict, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, editable=False)
+    progress = models.PositiveIntegerField(default=0, editable=False)
+    total = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # The message for the editors, or the traceback of a failed job
+    result = models.TextField(blank=True, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, editable=False
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # The worker takes the oldest queued job
+        indexes = [models.Index(fields=["status", "created_at"], name="articles_job_status_idx")]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
+
+    def set_progress(self, progress: int, total: Optional[int] = None):
+        self.progress, self.total = progress, total
+        Job.objects.filter(pk=self.pk).update(progress=progress, total=total)
+
+    def progress_display(self) -> str:
+        if self.total is None:
+            return str(self.progress) if self.progress else ""
+        return f"{self.progress} / {self.total}"
+
+    progress_display.short_description = "Progress"
+
+
+class Generation(models.Model):
+    """
+    The time of the last change of something cached, e.g. of the content of the feeds.
+    Kept in the database instead of the cache, so that it is never evicted and only
+    ever moves forward.
+    """
+
+    name = models.CharField(max_length=64, primary_key=True)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def current(cls, name: str, initial: Callable[[], datetime]) -> datetime:
+        """The generation, starting from initial() the first time it is read."""
+        changed_at = cls.objects.filter(name=name).values_list("changed_at", flat=True).first()
+        if changed_at is None:
+            changed_at = cls.objects.get_or_create(
+                name=name, defaults={"changed_at": initial()}
+            )[0].changed_at
+        return changed_at
+
+    @classmethod
+    def bump(cls, name: str) -> datetime:
+        now = timezone.now()
+        with transaction.atomic():
+            generation, created = cls.objects.select_for_update().get_or_create(
+                name=name, defaults={"changed_at": now}
+            )
+            if not created:
+                # Forward even if the clock of another server is ahead
+                generation.changed_at = max(now, generation.changed_at + timedelta(microseconds=1))
+                generation.save(update_fields=["changed_at"])
+        return generation.changed_at
+
 
 @register_snippet
 class GenerateTopics(ClusterableModel):
@@ -1275,7 +1533,10 @@ class GenerateTopics(ClusterableModel):
     ]
 
     def get_generate(self):
-        return mark_safe(f"<a href='generate/{self.pk}' class='button button-small button-secondary' type='button'>Generate</a>")
+        return mark_safe(
+            f"<a href='generate/{self.pk}?dry_run=1' class='button button-small button-secondary' type='button'>Preview</a> "
+            f"<a href='generate/{self.pk}' class='button button-small button-secondary' type='button'>Generate</a>"
+        )
 
     def __str__(self):
         return self.name
@@ -1290,25 +1551,62 @@ class GenerateTopicsConnection(models.Model):
     panels = [SnippetChooserPanel("topic")]
 
 
-def get_generate(instance_pk):
+def generate_topic_article_ids(generate: GenerateTopics) -> models.QuerySet:
+    """The articles with one of the topics of the generation, but without its parent topic."""
+    topic_ids = GenerateTopicsConnection.objects.filter(parent_topic=generate).values("topic_id")
+    with_parent_topic = ArticleTopicConnection.objects.filter(
+        topic_id=generate.parent_top_id
+    ).values("article_id")
+    return (
+        ArticleTopicConnection.objects.filter(topic_id__in=topic_ids)
+        .exclude(article_id__in=with_parent_topic)
+        .order_by()
+        .values_list("article_id", flat=True)
+        .distinct()
+    )
 
-    modelname = ArticleTopicConnection
 
-    parent_topic = get_object_or_404(GenerateTopics, pk=instance_pk)
-    parent_topic_id = parent_topic.parent_top_id
-    list_of_topics = list(GenerateTopicsConnection.objects.filter(parent_topic_id=instance_pk).values_list('topic_id', flat=True))
+def get_generate(
+    instance_pk,
+    dry_run: bool = False,
+    batch_size: int = 500,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Add the parent topic of the generation to the articles with one of its topics.
 
-    list_article_topics_with_parent_topic = list(ArticleTopicConnection.objects.filter(topic_id=parent_topic_id).values_list('article_id', flat=True))
-    list_article_topics_without_parent_topic = list(ArticleTopicConnection.objects.exclude(article_id__in=list_article_topics_with_parent_topic).values_list('article_id', 'topic_id',))
+    :param dry_run: Only count the articles, without changing them.
+    :param progress: Called with the number of reindexed and of all affected articles.
+    :return: The number of articles the parent topic has been (or would be) added to.
+    """
+    from .feeds import bump_content_generation
+
+    generate = get_object_or_404(GenerateTopics, pk=instance_pk)
+    if generate.parent_top_id is None:
+        return 0
+    article_ids = generate_topic_article_ids(generate)
+    if dry_run:
+        return article_ids.count()
+
+    with transaction.atomic():
+        article_ids = list(article_ids)
+        ArticleTopicConnection.objects.bulk_create(
+            [
+                ArticleTopicConnection(article_id=article_id, topic_id=generate.parent_top_id, sort_order=0)
+                for article_id in article_ids
+            ],
+            batch_size=batch_size,
+        )
+    total = len(article_ids)
 
-    count_added_topics = 0
-    d = dict()
-    for key, value in list_article_topics_without_parent_topic:
-        d[key] = d.get(key, []) + [value]
-    for key, value in d.items():
-        for x in list_of_topics:
-            if x in value:
-                count_added_topics += 1
-                modelname.objects.create(article_id=key, topic_id=parent_topic_id, sort_order=0)
-                break
-    return count_added_topics
\ No newline at end of file
+    def report(reindexed: int):
+        progress(reindexed, total)
+
+    if progress is not None:
+        progress(0, total)
+    reindex_pages(
+        article_ids, batch_size=batch_size, progress=report if progress is not None else None
+    )
+    # The topic feeds of the parent topic have changed
+    bump_content_generation()
+    return total
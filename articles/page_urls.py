@@ -0,0 +1,77 @@
+"""
+Keeps the precomputed URLs of the articles (Article.cached_url and cached_full_url)
+up to date.
+
+The URLs are calculated from the url_path and the cached site root paths the same
+way as Page.get_url_parts, but without loading the pages, so that whole subtrees
+can be updated after a move with a values query and bulk updates.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.urls import NoReverseMatch, reverse
+from tqdm import tqdm
+from wagtail.core.models import Page, Site
+
+from .models import Article
+
+
+def url_parts(
+    url_path: str, root_paths: Sequence[Tuple]
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The (url, full_url) of the page with the url_path, as returned by
+    Page.url and Page.full_url without a request.
+    """
+    for _site_id, root_path, root_url, _language_code in root_paths:
+        if url_path.startswith(root_path):
+            break
+    else:
+        return None, None
+
+    try:
+        page_path = reverse("wagtail_serve", args=(url_path[len(root_path):],))
+    except NoReverseMatch:
+        return None, None
+    if not getattr(settings, "WAGTAIL_APPEND_SLASH", True) and page_path != "/":
+        page_path = page_path.rstrip("/")
+
+    full_url = root_url + page_path
+    # Relative if there is only one site, see Page.get_url
+    url = page_path if len(root_paths) == 1 else full_url
+    return url, full_url
+
+
+def update_urls(queryset: QuerySet, batch_size: int = 500, progress: bool = False) -> int:
+    """
+    Recalculate the URLs of the articles in the queryset of Article.
+
+    :return: The number of articles whose URLs have changed.
+    """
+    root_paths = Site.get_site_root_paths()
+    changed = []
+    updated = 0
+    rows = queryset.values_list("pk", "url_path", "cached_url", "cached_full_url")
+    for pk, url_path, cached_url, cached_full_url in tqdm(
+        rows.iterator(chunk_size=batch_size), disable=not progress
+    ):
+        url, full_url = url_parts(url_path, root_paths)
+        url, full_url = url or "", full_url or ""
+        if (url, full_url) == (cached_url, cached_full_url):
+            continue
+        changed.append(Article(pk=pk, cached_url=url, cached_full_url=full_url))
+        if len(changed) >= batch_size:
+            Article.objects.bulk_update(changed, ["cached_url", "cached_full_url"])
+            updated += len(changed)
+            changed = []
+    if changed:
+        Article.objects.bulk_update(changed, ["cached_url", "cached_full_url"])
+        updated += len(changed)
+    return updated
+
+
+def update_subtree_urls(page: Page) -> int:
+    """After the page has been moved or its slug has changed."""
+    return update_urls(Article.objects.descendant_of(page, inclusive=True))
@@ -0,0 +1,154 @@
+"""
+Keeps the sites and the site settings in the memory of each process.
+
+They are read on nearly every request, but change very rarely. The caches are
+filled by warm_up when the WSGI application starts, and invalidated by the signal
+handlers when a site or a setting is saved. The other processes notice the
+invalidation through a version in the shared cache, checked at most once a second.
+"""
+
+import logging
+import time
+import uuid
+from typing import Callable, Dict, Hashable, List, Optional, Type, TypeVar
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.http.request import split_domain_port
+from wagtail.contrib.settings.models import BaseSetting
+from wagtail.core.models import Site
+
+logger = logging.getLogger(__name__)
+
+# For how many seconds a process can use its values without checking the version
+CHECK_INTERVAL = 1
+
+T = TypeVar("T")
+SettingT = TypeVar("SettingT", bound=BaseSetting)
+
+
+class ProcessCache:
+    def __init__(self, name: str):
+        self.version_key = f"articles:process_cache:{name}"
+        self.values: Dict[Hashable, object] = {}
+        self.version: Optional[str] = None
+        self.checked_at = 0.0
+
+    def check_version(self):
+        now = time.monotonic()
+        if now - self.checked_at < CHECK_INTERVAL:
+            return
+        version = cache.get(self.version_key)
+        if version != self.version:
+            self.values = {}
+            self.version = version
+        self.checked_at = now
+
+    def get(self, key: Hashable, load: Callable[[], T]) -> T:
+        self.check_version()
+        values = self.values
+        try:
+            return values[key]
+        except KeyError:
+            value = values[key] = load()
+            return value
+
+    def invalidate(self):
+        """Invalidate the values in all processes."""
+        self.version = uuid.uuid4().hex
+        cache.set(self.version_key, self.version, None)
+        self.values = {}
+
+
+sites = ProcessCache("sites")
+site_settings = ProcessCache("site_settings")
+
+
+def load_sites() -> List[Site]:
+    return list(Site.objects.select_related("root_page").order_by("pk"))
+
+
+def find_site(all_sites: List[Site], hostname: str, port: str) -> Optional[Site]:
+    """
+    Same as wagtail.core.sites.get_site_for_hostname, over the configured sites.
+    Unknown hosts get the default site.
+    """
+
+    def match(site: Site) -> int:
+        if site.hostname == hostname:
+            if str(site.port) == port:
+                return 0
+            return 1 if site.is_default_site else 3
+        return 2
+
+    candidates = sorted(
+        (site for site in all_sites if site.hostname == hostname or site.is_default_site),
+        key=match,
+    )
+    if not candidates:
+        return None
+    if len(candidates) == 1 or match(candidates[0]) < 2:
+        return candidates[0]
+    if match(candidates[0]) == 2:
+        # The default, unless a single other site has the hostname
+        return candidates[len(candidates) == 2]
+    return None
+
+
+def site_for_request(request) -> Optional[Site]:
+    """
+    Same as Site.find_for_request, without a query per request.
+    Only the configured sites are kept, so the memory used does not depend on the
+    Host headers of the requests.
+    """
+    if not hasattr(request, "_wagtail_site"):
+        hostname = split_domain_port(request.get_host())[0]
+        port = str(request.get_port())
+        request._wagtail_site = find_site(sites.get("all", load_sites), hostname, port)
+    return request._wagtail_site
+
+
+def load_setting(model: Type[SettingT], site: Site) -> SettingT:
+    instance = model.for_site(site)
+    # Load the related objects (e.g. the icons) once, instead of on each request
+    for field in model._meta.concrete_fields:
+        if field.is_relation:
+            getattr(instance, field.name)
+    return instance
+
+
+def setting_for_request(model: Type[SettingT], request) -> SettingT:
+    """
+    Same as BaseSetting.for_request, without a query per request.
+    The instance is shared between requests, so it must not be modified.
+    """
+    attr_name = model.get_cache_attr_name()
+    if not hasattr(request, attr_name):
+        site = site_for_request(request)
+        setting = site_settings.get(
+            (model._meta.label, site.pk if site else None),
+            lambda: load_setting(model, site),
+        )
+        setattr(request, attr_name, setting)
+    return getattr(request, attr_name)
+
+
+def warm_up():
+    """
+    Preload the sites, their root paths and settings and the content types,
+    so that the first requests do not have to.
+    """
+    from .settings import ArticlesRSSFeedsSettings, ArticleTypesSettings
+
+    try:
+        Site.get_site_root_paths()
+        ContentType.objects.get_for_models(*apps.get_models())
+        for site in sites.get("all", load_sites):
+            for model in (ArticlesRSSFeedsSettings, ArticleTypesSettings):
+                site_settings.get(
+                    (model._meta.label, site.pk), lambda: load_setting(model, site)
+                )
+    except Exception:
+        # E.g. before the first migration. The caches are filled on demand instead.
+        logger.exception("Could not warm up the process caches")
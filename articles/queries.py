@@ -1,11 +1,15 @@
 import graphene
 from graphene_django import DjangoObjectType
+from grapple.utils import resolve_queryset
 from wagtail.core.models import Page
 from django.db.models import Count
 from .models import Article, ArticleTopic, Summits, Author, DTWChannel
 from django.contrib.contenttypes.models import ContentType
 import datetime
 
+# The arguments of the articles query handled by grapple, the others are filters
+RESOLVE_QUERYSET_ARGS = {"limit", "offset", "search_query", "id", "order", "collection"}
+
 
 class RelatedArticlePageType(DjangoObjectType):
     class Meta:
@@ -94,6 +98,25 @@ class DTWAllPagesType(graphene.ObjectType):
 class CustomQuery(graphene.ObjectType):
     related = graphene.Field(RelatedPageType, url_path=graphene.String(), order=graphene.String())
 
+    def resolve_articles(root, info, topics__topic__slug__in=None, token=None, **kwargs):
+        """
+        Resolves the articles query registered on Article, so that its topic slugs
+        also match the subtopics, with in_topics. This resolver is used because the
+        articles app is before grapple in INSTALLED_APPS, so CustomQuery is before
+        the query mixins of grapple in the bases of the schema.
+        The preview token is only used by the singular article query.
+        """
+        articles = Article.objects.live().public()
+        if topics__topic__slug__in:
+            articles = articles.in_topics(topics__topic__slug__in)
+        filters = {
+            name: kwargs.pop(name)
+            for name in list(kwargs)
+            if name not in RESOLVE_QUERYSET_ARGS
+        }
+        kwargs.setdefault("order", "-first_published_at")
+        return resolve_queryset(articles.filter(**filters), info, **kwargs)
+
     def resolve_related(self, info, url_path=None, order='-first_published_at'):
         no_errors = True
         current_page = Page.objects.get(url_path__endswith=url_path)
@@ -158,8 +181,6 @@ class CustomQuery(graphene.ObjectType):
             filter_dict['title__icontains'] = search_title
         if content_type_model:
             filter_dict['content_type__model__in'] = content_type_model.split(',')
-        if topic_slug:
-            filter_dict['topics__topic__slug__in'] = topic_slug.split(',')
         if summit_name:
             filter_dict['summits__summit__name__in'] = summit_name.split(',')
         if author_display_name:
@@ -189,7 +210,12 @@ class CustomQuery(graphene.ObjectType):
 
         topics = ArticleTopic.objects.prefetch_related('articletopicconnection_set').filter(articletopicconnection__article_id__in=all_articles_id).annotate(numchild=Count('pk'))
 
-        count_articles = Article.objects.filter(pk__in=all_articles_id, **filter_dict).count()
+        channel_articles = Article.objects.filter(pk__in=all_articles_id, **filter_dict)
+        if topic_slug:
+            # Also matches the subtopics
+            channel_articles = channel_articles.in_topics(topic_slug.split(','))
+
+        count_articles = channel_articles.count()
 
         if limit:
             article_limit = limit
@@ -198,9 +224,9 @@ class CustomQuery(graphene.ObjectType):
                 article_offset = (offset * limit)
                 article_limit = (offset * limit) + limit
 
-            articles = Article.objects.filter(pk__in=all_articles_id, **filter_dict).order_by(order)[article_offset:article_limit]
+            articles = channel_articles.order_by(order)[article_offset:article_limit]
         else:
-            articles = Article.objects.filter(pk__in=all_articles_id, **filter_dict).order_by(order)
+            articles = channel_articles.order_by(order)
 
         return {"page": page,
                 "parent_of_articles": parent_of_articles,
@@ -0,0 +1,102 @@
+"""
+Calculates how long it takes to read (or watch) an article.
+
+Used when the editors leave the indicator_of_time field of an article empty.
+The words are counted on the text extracted by articles.text. Only that text is
+cached, by the hash of the content, so the reading times follow every change of the
+body, including the ones made without a revision (e.g. by run_content_filter).
+Counting the words of the cached text is cheap enough not to cache its result.
+"""
+
+import re
+from typing import Dict, Iterable, Optional
+
+from django.db.models import QuerySet
+from tqdm import tqdm
+from wagtail.core.models import get_page_models
+
+from .models import Article
+from .text import body_text, body_texts, html_to_text
+
+READING_WORDS_PER_MINUTE = 200
+# Used for the transcriptions of videos
+SPEAKING_WORDS_PER_MINUTE = 150
+
+WORD_RE = re.compile(r"\w+")
+
+
+def count_words(text: str) -> int:
+    return len(WORD_RE.findall(text))
+
+
+def format_minutes(words: int, transcription: bool) -> str:
+    if transcription:
+        minutes = max(1, round(words / SPEAKING_WORDS_PER_MINUTE))
+        return f"{minutes} min watch"
+    minutes = max(1, round(words / READING_WORDS_PER_MINUTE))
+    return f"{minutes} min read"
+
+
+def calculate(raw_body: Iterable[dict], transcription: Optional[str] = None) -> str:
+    """
+    Videos with a transcription are timed by the transcription,
+    everything else by the text of the body.
+    """
+    if transcription:
+        return format_minutes(
+            count_words(html_to_text(transcription)), transcription=True
+        )
+    return format_minutes(count_words(body_text(raw_body)), transcription=False)
+
+
+def reading_time(article: Article) -> str:
+    return calculate(article.body.raw_data, getattr(article, "transcription", None))
+
+
+def reading_times(queryset: QuerySet, batch_size: int = 500) -> Dict[int, str]:
+    """
+    Calculates the reading times of all articles in the queryset,
+    which must contain only instances of its exact model (see calculate_all).
+    The rows are read with values(), and the cached texts are read in batches.
+    """
+    fields = ["pk", "body"]
+    has_transcription = any(
+        field.name == "transcription" for field in queryset.model._meta.get_fields()
+    )
+    if has_transcription:
+        fields.append("transcription")
+
+    results = {}
+    batch = []
+
+    def flush():
+        # The transcriptions are not cached, only the texts of the bodies
+        bodies = [row for row in batch if not row.get("transcription")]
+        texts = body_texts(row["body"].raw_data for row in bodies)
+        for row, text in zip(bodies, texts):
+            results[row["pk"]] = format_minutes(count_words(text), transcription=False)
+        for row in batch:
+            if row.get("transcription"):
+                results[row["pk"]] = calculate((), row["transcription"])
+        batch.clear()
+
+    for row in queryset.values(*fields).iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return results
+
+
+def calculate_all(progress: bool = False) -> Dict[int, str]:
+    """
+    Calculates the reading times of the whole archive, caching the texts of the
+    bodies on the way.
+    """
+    results = {}
+    models = [model for model in get_page_models() if issubclass(model, Article)]
+    for model in tqdm(models, disable=not progress):
+        queryset = model.objects.exact_type(model)
+        results.update(reading_times(queryset))
+    return results
@@ -0,0 +1,59 @@
+"""
+Updates the search index after bulk changes which bypass Page.save, such as
+bulk_create of the topic connections, in batches of the most specific models.
+"""
+
+from collections import defaultdict
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from wagtail.core.models import Page
+from wagtail.search.backends import get_search_backends
+from wagtail.search.index import class_is_indexed
+
+BATCH_SIZE = 500
+
+
+def batches(values: Iterable[int], size: int) -> Iterator[List[int]]:
+    values = iter(values)
+    while True:
+        batch = list(islice(values, size))
+        if not batch:
+            return
+        yield batch
+
+
+def reindex_pages(
+    page_ids: Iterable[int],
+    batch_size: int = BATCH_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Add the pages to the search indexes again, with the related fields of each
+    batch prefetched as by the update_index command.
+
+    :param progress: Called with the number of pages reindexed so far after each batch.
+
+    :return: The number of reindexed pages.
+    """
+    ids_by_content_type: Dict[int, List[int]] = defaultdict(list)
+    for batch in batches(page_ids, batch_size):
+        rows = Page.objects.filter(pk__in=batch).values_list("content_type_id", "pk")
+        for content_type_id, pk in rows:
+            ids_by_content_type[content_type_id].append(pk)
+
+    backends = list(get_search_backends(with_auto_update=True))
+    reindexed = 0
+    for content_type_id, ids in ids_by_content_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None or not class_is_indexed(model):
+            continue
+        for batch in batches(ids, batch_size):
+            pages = list(model.get_indexed_objects().filter(pk__in=batch))
+            for backend in backends:
+                backend.add_bulk(model, pages)
+            reindexed += len(pages)
+            if progress is not None:
+                progress(reindexed)
+    return reindexed
@@ -78,6 +78,20 @@ class ArticlesRSSFeedsSettings(RSSFeedsSettings):
         default=500,
     )
 
+    cache_max_age = models.PositiveIntegerField(
+        verbose_name="Cache max age",
+        help_text="For how many seconds can feed readers and proxies use a copy "
+        "of the feed without asking whether it has changed. "
+        "0 means they have to ask every time.",
+        default=0,
+    )
+    cache_stale_while_revalidate = models.PositiveIntegerField(
+        verbose_name="Cache stale while revalidate",
+        help_text="For how many seconds after the max age can a stale copy "
+        "of the feed be served while it is being revalidated in the background.",
+        default=0,
+    )
+
     last_changed_at = models.DateTimeField(editable=False, auto_now=True)
 
     class Meta:
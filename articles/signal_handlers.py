@@ -0,0 +1,150 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from wagtail.core.models import Site, get_page_models
+from wagtail.core.signals import (
+    page_published,
+    page_slug_changed,
+    page_unpublished,
+    post_page_move,
+)
+from wagtail.images import get_image_model
+
+from .jobs import enqueue_once
+from .list_filters import invalidate_list_filters
+from .models import Article, ArticleSource, ArticleTopic, Author, ImageAnalysis
+from .page_urls import update_subtree_urls, update_urls
+from .process_cache import site_settings, sites
+from .settings import ArticlesRSSFeedsSettings, ArticleTypesSettings
+from .sitemaps import invalidate_all_sitemaps, invalidate_sitemaps
+
+
+def regenerate_feeds(sender, instance, **kwargs):
+    if not isinstance(instance, Article):
+        return
+
+    from .feeds import bump_content_generation, regenerate_cached_feeds_in_background
+
+    # The feeds must not be generated for the new ETag before the article is visible,
+    # and the thread must see the published article, so wait for the commit
+    transaction.on_commit(bump_content_generation)
+    transaction.on_commit(regenerate_cached_feeds_in_background)
+
+
+def feed_items_changed(sender, instance, created=False, **kwargs):
+    # Shown in, or linked from, the cached items of the feeds. New objects are in none.
+    if created:
+        return
+
+    from .feeds import bump_item_generation, regenerate_cached_feeds_in_background
+
+    transaction.on_commit(bump_item_generation)
+    transaction.on_commit(regenerate_cached_feeds_in_background)
+
+
+def feed_settings_saved(sender, instance, **kwargs):
+    from .feeds import bump_content_generation
+
+    transaction.on_commit(bump_content_generation)
+
+
+def page_changed(sender, instance, **kwargs):
+    # The id of a deleted page is cleared before the commit, so read it now
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_sitemaps([pk]))
+
+
+def list_filter_choices_changed(sender, instance, **kwargs):
+    # The years of the articles, or the topics, authors and sources to filter by
+    if isinstance(instance, (Article, ArticleTopic, Author, ArticleSource)):
+        transaction.on_commit(invalidate_list_filters)
+
+
+def page_urls_changed(sender, instance, url_path_before=None, url_path_after=None, **kwargs):
+    if url_path_before is not None and url_path_before == url_path_after:
+        # Moved among its siblings, the URLs have not changed
+        return
+    # The URLs of all the descendants have changed as well
+    update_subtree_urls(instance)
+    transaction.on_commit(invalidate_all_sitemaps)
+    feed_items_changed(sender, instance)
+
+
+def article_published(sender, instance, **kwargs):
+    if isinstance(instance, Article):
+        update_urls(Article.objects.filter(pk=instance.pk))
+
+
+def sites_changed(sender, instance, **kwargs):
+    transaction.on_commit(sites.invalidate)
+    transaction.on_commit(site_settings.invalidate)
+    # Relative URLs are only used while there is a single site, see page_urls.url_parts.
+    # All the articles are updated, so not in the request.
+    transaction.on_commit(lambda: enqueue_once("update_article_urls"))
+
+
+def site_setting_changed(sender, instance, **kwargs):
+    transaction.on_commit(site_settings.invalidate)
+
+
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    from .image_analysis import update_title_flag
+
+    update_title_flag(instance)
+    # E.g. the file_hash or the focal point, the file itself has not changed
+    if update_fields is not None and "file" not in update_fields:
+        return
+    # The worker must see the new file, so wait for the commit
+    transaction.on_commit(lambda: enqueue_once("analyze_images"))
+
+
+def image_analysis_deleted(sender, instance, **kwargs):
+    from .image_analysis import update_duplicates
+
+    # The remaining copy of a deleted duplicate is not a duplicate anymore
+    transaction.on_commit(update_duplicates)
+
+
+def topic_deleted(sender, instance, **kwargs):
+    # Keep the subtopics in the hierarchy, below the parent of the deleted topic
+    for child in instance.children.all():
+        child.parent_id = instance.parent_id
+        child.save(update_fields=["parent"])
+
+
+def register_signal_handlers():
+    article_models = [model for model in get_page_models() if issubclass(model, Article)]
+    page_published.connect(regenerate_feeds)
+    page_unpublished.connect(regenerate_feeds)
+    for model in article_models:
+        post_delete.connect(regenerate_feeds, sender=model)
+    post_save.connect(feed_settings_saved, sender=ArticlesRSSFeedsSettings)
+    for model in (Author, ArticleTopic, get_image_model()):
+        post_save.connect(feed_items_changed, sender=model)
+        post_delete.connect(feed_items_changed, sender=model)
+
+    page_published.connect(page_changed)
+    page_unpublished.connect(page_changed)
+    for model in get_page_models():
+        post_delete.connect(page_changed, sender=model)
+    page_slug_changed.connect(page_urls_changed)
+    post_page_move.connect(page_urls_changed)
+
+    page_published.connect(article_published)
+    post_save.connect(sites_changed, sender=Site)
+    post_delete.connect(sites_changed, sender=Site)
+
+    for model in (ArticlesRSSFeedsSettings, ArticleTypesSettings):
+        post_save.connect(site_setting_changed, sender=model)
+        post_delete.connect(site_setting_changed, sender=model)
+
+    page_published.connect(list_filter_choices_changed)
+    page_unpublished.connect(list_filter_choices_changed)
+    for model in article_models:
+        post_delete.connect(list_filter_choices_changed, sender=model)
+    for model in (ArticleTopic, Author, ArticleSource):
+        post_save.connect(list_filter_choices_changed, sender=model)
+        post_delete.connect(list_filter_choices_changed, sender=model)
+
+    post_save.connect(image_saved, sender=get_image_model())
+    post_delete.connect(image_analysis_deleted, sender=ImageAnalysis)
+    pre_delete.connect(topic_deleted, sender=ArticleTopic)
@@ -0,0 +1,141 @@
+"""
+Sharded sitemaps of the live pages.
+
+The pages are split into shards of SHARD_SIZE by their id, so a page always stays
+in the same shard and publishing it only invalidates that shard (and the index).
+The shards are generated from a values query over the live pages, with the URLs
+built from the url_path and the cached site root paths, so no page is loaded.
+"""
+
+from typing import Iterable, Optional
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.http import Http404, HttpResponse
+from wagtail.core.models import Page, Site
+
+from .process_cache import site_for_request
+
+# The maximum number of URLs in a sitemap, see https://www.sitemaps.org/protocol.html
+SHARD_SIZE = 50000
+
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def index_key(site_id: int) -> str:
+    return f"articles:sitemap:{site_id}:index"
+
+
+def shard_key(site_id: int, shard: int) -> str:
+    return f"articles:sitemap:{site_id}:{shard}"
+
+
+def site_root_path(site: Site) -> str:
+    for root_path in Site.get_site_root_paths():
+        if root_path.site_id == site.pk:
+            return root_path.root_path
+    return site.root_page.url_path
+
+
+def site_pages(site: Site):
+    return (
+        Page.objects.live()
+        .public()
+        .filter(path__startswith=site.root_page.path)
+        .order_by()
+    )
+
+
+def lastmod(value) -> Optional[str]:
+    return value.date().isoformat() if value else None
+
+
+def render_index(site: Site) -> str:
+    """One sitemap per shard, with the time of the last publication in the shard."""
+    shards = (
+        site_pages(site)
+        .annotate(shard=F("id") / SHARD_SIZE)
+        .values("shard")
+        .annotate(last_published_at=Max("last_published_at"))
+        .order_by("shard")
+    )
+    parts = [XML_HEADER, f'<sitemapindex xmlns="{XMLNS}">']
+    root_url = escape(site.root_url)
+    for shard in shards:
+        parts.append(f"<sitemap><loc>{root_url}/sitemap-{shard['shard']}.xml</loc>")
+        if shard["last_published_at"]:
+            parts.append(f"<lastmod>{lastmod(shard['last_published_at'])}</lastmod>")
+        parts.append("</sitemap>")
+    parts.append("</sitemapindex>")
+    return "".join(parts)
+
+
+def render_shard(site: Site, shard: int) -> Optional[str]:
+    """The URLs of the live pages of the site in the shard, if there are any."""
+    rows = (
+        site_pages(site)
+        .filter(id__gte=shard * SHARD_SIZE, id__lt=(shard + 1) * SHARD_SIZE)
+        .order_by("id")
+        .values_list("url_path", "last_published_at")
+    )
+    # The url_path of the root page ends with a slash, like the paths below it
+    prefix_length = len(site_root_path(site)) - 1
+    parts = [XML_HEADER, f'<urlset xmlns="{XMLNS}">']
+    for url_path, last_published_at in rows.iterator():
+        url = site.root_url + url_path[prefix_length:]
+        parts.append(f"<url><loc>{escape(url)}</loc>")
+        if last_published_at:
+            parts.append(f"<lastmod>{lastmod(last_published_at)}</lastmod>")
+        parts.append("</url>")
+    if len(parts) == 2:
+        return None
+    parts.append("</urlset>")
+    return "".join(parts)
+
+
+def sitemap_response(content: str) -> HttpResponse:
+    return HttpResponse(content, content_type="application/xml; charset=utf-8")
+
+
+def sitemap_index(request):
+    site = site_for_request(request)
+    if site is None:
+        raise Http404
+    content = cache.get(index_key(site.pk))
+    if content is None:
+        content = render_index(site)
+        cache.set(index_key(site.pk), content, SITEMAP_CACHE_TIMEOUT)
+    return sitemap_response(content)
+
+
+def sitemap_shard(request, shard: int):
+    site = site_for_request(request)
+    if site is None:
+        raise Http404
+    content = cache.get(shard_key(site.pk, shard))
+    if content is None:
+        content = render_shard(site, shard)
+        if content is None:
+            raise Http404
+        cache.set(shard_key(site.pk, shard), content, SITEMAP_CACHE_TIMEOUT)
+    return sitemap_response(content)
+
+
+def invalidate_sitemaps(page_ids: Iterable[int]):
+    """Invalidate the shards of the pages, and the indexes, of all sites."""
+    shards = {page_id // SHARD_SIZE for page_id in page_ids}
+    site_ids = list(Site.objects.values_list("pk", flat=True))
+    cache.delete_many(
+        [index_key(site_id) for site_id in site_ids]
+        + [shard_key(site_id, shard) for site_id in site_ids for shard in shards]
+    )
+
+
+def invalidate_all_sitemaps():
+    """Invalidate every shard, e.g. after the URLs of a whole subtree have changed."""
+    max_id = Page.objects.aggregate(Max("id"))["id__max"] or 0
+    invalidate_sitemaps(range(0, max_id + 1, SHARD_SIZE))
@@ -0,0 +1,15 @@
+from django import template
+
+from ..image_usage import set_usage_counts
+
+register = template.Library()
+
+
+@register.simple_tag
+def load_usage_counts(objects):
+    """
+    {% load_usage_counts images %} sets usage_count on each of the objects,
+    counted for all of them together instead of with get_usage per object.
+    """
+    set_usage_counts(objects)
+    return ""
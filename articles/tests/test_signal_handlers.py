@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.test import TestCase
+from wagtail.core.models import Page
+from wagtail.core.signals import post_page_move
+
+
+class PageChangedTestCase(TestCase):
+    def setUp(self):
+        self.page = Page.get_first_root_node().add_child(
+            instance=Page(title="Test", slug="test")
+        )
+
+    @mock.patch("articles.signal_handlers.invalidate_sitemaps")
+    def test_deleted_page_invalidates_its_sitemaps(self, invalidate_sitemaps):
+        pk = self.page.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.delete()
+
+        invalidate_sitemaps.assert_any_call([pk])
+        self.assertNotIn(mock.call([None]), invalidate_sitemaps.call_args_list)
+
+
+class PageURLsChangedTestCase(TestCase):
+    def setUp(self):
+        self.root = Page.get_first_root_node()
+        self.page = self.root.add_child(instance=Page(title="Test", slug="test"))
+
+    def send_post_page_move(self, url_path_after):
+        post_page_move.send(
+            sender=Page,
+            instance=self.page,
+            parent_page_before=self.root,
+            parent_page_after=self.root,
+            url_path_before=self.page.url_path,
+            url_path_after=url_path_after,
+        )
+
+    @mock.patch("articles.signal_handlers.update_subtree_urls")
+    def test_reordered_page_keeps_its_urls(self, update_subtree_urls):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send_post_page_move(self.page.url_path)
+
+        update_subtree_urls.assert_not_called()
+
+    @mock.patch("articles.signal_handlers.update_subtree_urls")
+    def test_moved_page_updates_its_urls(self, update_subtree_urls):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send_post_page_move("/moved/test/")
+
+        update_subtree_urls.assert_called_once_with(self.page)
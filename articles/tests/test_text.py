@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase
+
+from articles.content_filters import SHORTCODE_NAMES, ShortcodeFilterInboundButton
+from articles.text import html_to_text
+
+
+class HTMLToTextTestCase(SimpleTestCase):
+    def test_bracketed_prose_is_kept(self):
+        self.assertEqual(
+            html_to_text("<p>They said [sic] that [the company] grew [1].</p>"),
+            "They said [sic] that [the company] grew [1].",
+        )
+
+    def test_shortcodes_are_stripped(self):
+        self.assertEqual(
+            html_to_text(
+                '[caption id="1"]<img src="a.jpg"> A photo[/caption] '
+                '[inbound_button url="https://example.com"]Sign up[/inbound_button]'
+            ),
+            "A photo Sign up",
+        )
+
+    def test_filter_shortcodes_are_known(self):
+        parser = ShortcodeFilterInboundButton().parser
+        self.assertLessEqual(set(parser.keywords), set(SHORTCODE_NAMES))
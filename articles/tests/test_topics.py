@@ -0,0 +1,48 @@
+import json
+
+from django.test import TestCase
+from wagtail.core.models import Page
+
+from articles.models import Article, ArticleTopic, ArticleTopicConnection
+
+
+class TopicHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.parent = ArticleTopic.objects.create(name="Parent", slug="parent")
+        self.child = ArticleTopic.objects.create(name="Child", slug="child", parent=self.parent)
+        self.other = ArticleTopic.objects.create(name="Other", slug="other")
+
+        root = Page.get_first_root_node()
+        self.articles = {}
+        for slug, topic in (("first", self.child), ("second", self.child), ("third", self.other)):
+            article = root.add_child(
+                instance=Article(
+                    title=slug.title(),
+                    slug=slug,
+                    body=json.dumps([{"type": "paragraph", "value": "<p>Text</p>"}]),
+                )
+            )
+            ArticleTopicConnection.objects.create(article=article, topic=topic)
+            self.articles[slug] = article
+
+    def test_in_topics_matches_subtopics(self):
+        self.assertCountEqual(
+            Article.objects.in_topics(["parent"]),
+            [self.articles["first"], self.articles["second"]],
+        )
+
+    def test_in_topics_keeps_the_other_filters(self):
+        # E.g. the articles of a channel in dtw_allpages
+        articles = Article.objects.filter(pk__in=[self.articles["first"].pk]).in_topics(["parent"])
+
+        self.assertCountEqual(articles, [self.articles["first"]])
+
+    def test_topic_slugs_lookup_matches_the_exact_topics(self):
+        self.assertFalse(Article.objects.filter(topics__topic__slug__in=["parent"]).exists())
+
+    def test_moved_topic_leaves_its_old_parent(self):
+        self.child.parent = None
+        self.child.save()
+
+        self.assertFalse(Article.objects.in_topics(["parent"]).exists())
+        self.assertEqual(Article.objects.in_topics(["child"]).count(), 2)
@@ -0,0 +1,102 @@
+"""
+Extracts plain text from article content.
+
+Tags and WordPress shortcodes are stripped in a single regex pass, without building
+a DOM. The text of Article.body is read from the raw StreamField data, so the blocks
+are never converted to their Python values. Used for the search index, the RSS item
+descriptions and the reading time.
+"""
+
+import hashlib
+import html
+import json
+import re
+from typing import Iterable, Iterator, List, Optional
+
+from django.core.cache import cache
+
+from .content_filters import SHORTCODE_NAMES
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Tags, comments and the known shortcodes such as [caption id="1"] or [/inbound_button].
+# Other text in square brackets (e.g. [1] or [sic]) is kept.
+MARKUP_RE = re.compile(
+    r"<!--.*?-->"
+    r"|</?[A-Za-z](?:[^>\"']|\"[^\"]*\"|'[^']*')*>"
+    r"|\[/?(?:" + "|".join(map(re.escape, SHORTCODE_NAMES)) + r")(?:\s[^\]]*)?\]",
+    re.DOTALL,
+)
+WHITESPACE_RE = re.compile(r"\s+")
+
+# The fields of the struct blocks in Article.body which hold text
+STRUCT_BLOCK_TEXT_FIELDS = {
+    "quote": ("quote", "image_caption"),
+    "image": ("caption",),
+    "floating_image": ("caption",),
+    "related_content": ("heading", "content"),
+}
+# Blocks whose string values are not text
+NON_TEXT_BLOCKS = {"embed"}
+
+
+def html_to_text(content: Optional[str]) -> str:
+    if not content:
+        return ""
+    text = html.unescape(MARKUP_RE.sub(" ", content))
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def iter_block_texts(raw_body: Iterable[dict]) -> Iterator[str]:
+    for item in raw_body:
+        value = item["value"]
+        if isinstance(value, str):
+            # Headings and rich text paragraphs
+            if item["type"] not in NON_TEXT_BLOCKS:
+                yield html_to_text(value)
+        elif isinstance(value, dict):
+            for field_name in STRUCT_BLOCK_TEXT_FIELDS.get(item["type"], ()):
+                yield html_to_text(value.get(field_name))
+
+
+def content_digest(content) -> str:
+    """A hash of raw content, e.g. the raw data of Article.body, for cache keys."""
+    return hashlib.sha1(
+        json.dumps(content, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def body_text_key(raw_body: list) -> str:
+    # Versioned, as the texts cached before were stripped of any text in brackets
+    return f"articles:body_text:2:{content_digest(raw_body)}"
+
+
+def extract_body_text(raw_body: Iterable[dict]) -> str:
+    return "\n".join(filter(None, iter_block_texts(raw_body)))
+
+
+def body_text(raw_body: Iterable[dict]) -> str:
+    """
+    The text of all blocks of Article.body, separated by newlines.
+    Cached by the hash of the raw data, so unchanged bodies are not processed again.
+    """
+    raw_body = list(raw_body)
+    key = body_text_key(raw_body)
+    text = cache.get(key)
+    if text is None:
+        text = extract_body_text(raw_body)
+        cache.set(key, text, CACHE_TIMEOUT)
+    return text
+
+
+def body_texts(raw_bodies: Iterable[Iterable[dict]]) -> List[str]:
+    """Same as body_text for several bodies, with a single read of the cache."""
+    raw_bodies = [list(raw_body) for raw_body in raw_bodies]
+    keys = [body_text_key(raw_body) for raw_body in raw_bodies]
+    cached = cache.get_many(keys)
+    missing = {}
+    for key, raw_body in zip(keys, raw_bodies):
+        if key not in cached and key not in missing:
+            missing[key] = extract_body_text(raw_body)
+    cache.set_many(missing, CACHE_TIMEOUT)
+    return [cached.get(key, missing.get(key)) for key in keys]
@@ -4,7 +4,9 @@ from wagtail.contrib.modeladmin.options import (
     ModelAdminGroup,
     modeladmin_register,
 )
+from wagtail.contrib.modeladmin.views import IndexView
 from wagtail.core import hooks
+from wagtail.core.models import UserPagePermissionsProxy
 from wagtail.documents.wagtail_hooks import DocumentsMenuItem
 from wagtail.snippets.wagtail_hooks import SnippetsMenuItem
 
@@ -12,14 +14,23 @@ from django.contrib import messages
 from django.http import HttpResponseRedirect
 from django.conf.urls import url
 
-from wagtail.contrib.modeladmin.helpers import ButtonHelper
+from wagtail.contrib.modeladmin.helpers import (
+    AdminURLHelper,
+    ButtonHelper,
+    PermissionHelper,
+    WagtailBackendSearchHandler,
+)
 from django.contrib.admin.utils import quote
+from django.db.models import Case, When
+from django.urls import reverse
+from django.utils.html import mark_safe
+from django.utils.text import Truncator
 from django.utils.translation import ugettext_lazy as _
 
-from django.contrib.admin import SimpleListFilter
-from django.db.models import Count, Q
-
 from . import models
+from .exports import ArticleExportMixin
+from .jobs import enqueue
+from .list_filters import CachedRelatedFieldListFilter, YearFilter
 from .queries import CustomQuery
 
 HIDDEN_MENU_ITEMS = (
@@ -108,8 +119,76 @@ class SnippetGroup(ModelAdminGroup):
 # **         Articles         **
 # ******************************
 
+class RequestPermissionHelper:
+    """
+    The permission helper of a page model admin for the user of one request.
+    The results are memoised per object, and the page permissions of the user are
+    read once, instead of for each check of each row.
+    """
+
+    def __init__(self, permission_helper, user):
+        self.permission_helper = permission_helper
+        self.user = user
+        self.user_perms = UserPagePermissionsProxy(user)
+        self.testers = {}
+        self.results = {}
+
+    def __getattr__(self, name):
+        return getattr(self.permission_helper, name)
+
+    def prepare(self, objs):
+        """Create the permission testers for the whole page of rows at once."""
+        if hasattr(self.user_perms, "permissions"):
+            # Evaluated once, the testers iterate over the cached results
+            list(self.user_perms.permissions)
+        for obj in objs:
+            self.tester(obj)
+
+    def tester(self, obj):
+        if obj.pk not in self.testers:
+            self.testers[obj.pk] = self.user_perms.for_page(obj)
+        return self.testers[obj.pk]
+
+    def memoise(self, name, obj, check):
+        key = (name, obj.pk if obj is not None else None)
+        if key not in self.results:
+            self.results[key] = check()
+        return self.results[key]
+
+    def user_can_create(self, user):
+        return self.memoise("create", None, lambda: self.permission_helper.user_can_create(user))
+
+    def user_can_inspect_obj(self, user, obj):
+        return self.memoise(
+            "inspect", obj, lambda: self.permission_helper.user_can_inspect_obj(user, obj)
+        )
+
+    def user_can_edit_obj(self, user, obj):
+        return self.memoise("edit", obj, lambda: self.tester(obj).can_edit())
+
+    def user_can_delete_obj(self, user, obj):
+        return self.memoise("delete", obj, lambda: self.tester(obj).can_delete())
+
+
+class ArticleIndexView(ArticleExportMixin, IndexView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        self.button_helper.permission_helper.prepare(context["object_list"])
+        if getattr(self.search_handler, "truncated", False):
+            messages.warning(
+                self.request,
+                f"Only the {self.search_handler.max_results} best matches are listed. "
+                "Refine the search or the filters to see the others.",
+            )
+        return context
+
+
 class ModelButtonHelper(ButtonHelper):
 
+    def __init__(self, view, request):
+        super().__init__(view, request)
+        self.permission_helper = RequestPermissionHelper(self.permission_helper, request.user)
+
     def move_button(self, pk, classnames_add=[], classnames_exclude=[]):
         cn = self.finalise_classname(classnames_add, classnames_exclude)
         return {
@@ -138,69 +217,105 @@ class ModelButtonHelper(ButtonHelper):
         usr = self.request.user
         btns = super().get_buttons_for_obj(obj, exclude, classnames_add, classnames_exclude)
 
-        if "copy" not in exclude and ph.user_can_create(usr) or ph.user_can_edit_obj(usr, obj):
+        can_copy_or_move = ph.user_can_create(usr) or ph.user_can_edit_obj(usr, obj)
+
+        if "copy" not in exclude and can_copy_or_move:
             btns.append(self.copy_button(pk, classnames_add, classnames_exclude))
 
-        if "move" not in exclude and ph.user_can_create(usr) or ph.user_can_edit_obj(usr, obj):
+        if "move" not in exclude and can_copy_or_move:
             btns.append(self.move_button(pk, classnames_add, classnames_exclude))
 
         return btns
 
 
-class YearFilter(SimpleListFilter):
-
-    title = 'Years'
-    parameter_name = 'first_published_at__year'
+class ArticleSearchHandler(WagtailBackendSearchHandler):
+    """
+    Searches the index of the Wagtail search backend instead of running
+    icontains over the whole body.
+    The backend can only filter by indexed fields, so the matches are ranked by
+    relevance over all the articles, and the list filters are applied to them with
+    the ORM, batch by batch, until max_results of them are found. Those are then
+    shown in the ordering chosen in the list, or by relevance.
+    """
 
-    def lookups(self, request, model_admin):
-        data = []
-        all_years = model_admin.model.objects.filter(~Q(first_published_at__year=None)).values('first_published_at__year').annotate(cnt=Count('first_published_at__year')).order_by('-first_published_at__year')
-        if all_years:
-            for x in all_years:
-                data.append((x['first_published_at__year'], f"{x['first_published_at__year']} ({x['cnt']})"))
-        return data
+    # The best matching articles, the rest are not shown, see ArticleIndexView
+    max_results = 1000
+    # Whether the last search had more matches than max_results
+    truncated = False
 
-    def queryset(self, request, queryset):
-        if not self.value():
+    def search_queryset(self, queryset, search_term, preserve_order=False, **kwargs):
+        if not search_term:
             return queryset
-        return queryset.filter(first_published_at__year=self.value())
+        results = super().search_queryset(
+            queryset.model.objects.all(), search_term, preserve_order=False, **kwargs
+        )
+        pks = []
+        start = 0
+        while len(pks) <= self.max_results:
+            batch = [article.pk for article in results[start: start + self.max_results]]
+            if not batch:
+                break
+            start += len(batch)
+            # The matches in the filtered list, in the order of relevance
+            filtered = set(queryset.filter(pk__in=batch).values_list("pk", flat=True))
+            pks += [pk for pk in batch if pk in filtered]
+        self.truncated = len(pks) > self.max_results
+        pks = pks[: self.max_results]
+        queryset = queryset.filter(pk__in=pks)
+        if preserve_order or not pks:
+            return queryset
+        return queryset.order_by(
+            Case(*(When(pk=pk, then=position) for position, pk in enumerate(pks)))
+        )
 
 
 class ArticleAdminBase(ModelAdmin):
-    list_filter = [YearFilter, "first_published_at", "topics__topic", "authors__author"]
+    list_filter = [
+        YearFilter,
+        "first_published_at",
+        ("topics__topic", CachedRelatedFieldListFilter),
+        ("authors__author", CachedRelatedFieldListFilter),
+    ]
     list_display = ["title", "first_published_at", "last_published_at", "authors", "live"]
-    search_fields = ["title", "body"]
+    # Exported in batches by ArticleExportMixin, see exports.py
+    list_export = ["title", "cached_full_url", "first_published_at", "last_published_at", "live", "authors", "topics", "summits"]
+    export_filename = "articles"
+    search_fields = ["title", "body_text"]
+    search_handler_class = ArticleSearchHandler
+    # Loaded for the whole page of the list in one query each, instead of per row
+    list_prefetch_related = ["authors__author"]
 
     def authors(self, obj: models.Article):
-        return ", ".join(obj.authors.values_list("author__display_name", flat=True))
+        return ", ".join(connection.author.display_name for connection in obj.authors.all())
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.order_by('-first_published_at')
+        return qs.prefetch_related(*self.list_prefetch_related).order_by('-first_published_at')
 
     button_helper_class = ModelButtonHelper
+    index_view_class = ArticleIndexView
 
 
 class ArticleAdmin(ArticleAdminBase):
     model = models.Article
     list_display = ArticleAdminBase.list_display + ["content_type_name"]
-    list_filter = ["sources__source"] + ArticleAdminBase.list_filter
+    list_filter = [("sources__source", CachedRelatedFieldListFilter)] + ArticleAdminBase.list_filter
 
 
 class ResearchReportAdmin(ArticleAdminBase):
     model = models.ResearchReport
-    list_filter = ["sources__source"] + ArticleAdminBase.list_filter
+    list_filter = [("sources__source", CachedRelatedFieldListFilter)] + ArticleAdminBase.list_filter
 
 
 class CaseStudyAdmin(ArticleAdminBase):
     model = models.CaseStudy
-    list_filter = ["sources__source"] + ArticleAdminBase.list_filter
+    list_filter = [("sources__source", CachedRelatedFieldListFilter)] + ArticleAdminBase.list_filter
 
 
 class WebinarAdmin(ArticleAdminBase):
     model = models.Webinar
     list_display = ["title", "first_published_at", "start", "end", "authors", "live"]
-    list_filter = ["sources__source"] + ArticleAdminBase.list_filter
+    list_filter = [("sources__source", CachedRelatedFieldListFilter)] + ArticleAdminBase.list_filter
 
 
 class EBookAdmin(ArticleAdminBase):
@@ -226,6 +341,7 @@ class VideoAdmin(ArticleAdminBase):
 class VideoDTWAdmin(ArticleAdminBase):
     model = models.VideoDTW
     list_display = ["title", "first_published_at", "is_video_file", "get_summit", "live"]
+    list_prefetch_related = ArticleAdminBase.list_prefetch_related + ["summits__summit"]
 
 
 class WhitePaperAdmin(ArticleAdminBase):
@@ -301,11 +417,60 @@ class CompaniesGroup(ModelAdminGroup):
     )
 
 
+@modeladmin_register
+class ImageAnalysisAdmin(ModelAdmin):
+    model = models.ImageAnalysis
+    menu_label = "Image cleanup"
+    menu_icon = "image"
+    list_display = ["image", "edit_image", "is_duplicate", "is_untitled", "analyzed_at"]
+    list_filter = ["is_duplicate", "is_untitled"]
+    search_fields = ["image__title"]
+    # The duplicates next to each other
+    ordering = ["perceptual_hash", "checksum", "image_id"]
+
+    def edit_image(self, obj: models.ImageAnalysis):
+        url = reverse("wagtailimages:edit", args=(obj.image_id,))
+        return mark_safe(f"<a href='{url}' class='button button-small button-secondary'>Edit image</a>")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("image")
+
+
 @hooks.register("register_rich_text_features")
 def add_blockquote_default(features):
     features.default_features.append("blockquote")
 
 
+class JobPermissionHelper(PermissionHelper):
+    """The jobs are only created by the admin actions and changed by the worker."""
+
+    def user_can_create(self, user):
+        return False
+
+    def user_can_edit_obj(self, user, obj):
+        return False
+
+
+@modeladmin_register
+class JobAdmin(ModelAdmin):
+    model = models.Job
+    menu_label = "Jobs"
+    menu_icon = "time"
+    list_display = ["__str__", "status", "progress_display", "result_summary", "created_by", "created_at", "finished_at"]
+    list_filter = ["status", "name"]
+    ordering = ["-created_at"]
+    inspect_view_enabled = True
+    inspect_view_fields = ["name", "arguments", "status", "progress", "total", "result", "created_by", "created_at", "started_at", "finished_at"]
+    permission_helper_class = JobPermissionHelper
+
+    def result_summary(self, obj: models.Job):
+        # The message, or the exception at the end of the traceback
+        lines = obj.result.strip().splitlines()
+        return Truncator(lines[-1]).chars(120) if lines else ""
+
+    result_summary.short_description = "Result"
+
+
 @modeladmin_register
 class GenerateTopicsAdmin(ModelAdmin):
     model = models.GenerateTopics
@@ -314,12 +479,14 @@ class GenerateTopicsAdmin(ModelAdmin):
 
     def admin_view(self, request, instance_pk):
         self.instance_pk = instance_pk
-        count = models.get_generate(self.instance_pk)
-        if count > 0:
-            user_message = f"Added in {str(count)} Articles"
-        else:
-            user_message = f"Don`t added Topic"
-        return HttpResponseRedirect('/admin/articles/generatetopics', messages.success(request, user_message))
+        if request.GET.get("dry_run"):
+            count = models.get_generate(self.instance_pk, dry_run=True)
+            messages.info(request, f"Would be added in {count} Articles")
+            return HttpResponseRedirect('/admin/articles/generatetopics')
+        # Large generations take longer than a request may, the worker runs them
+        enqueue("generate_topics", user=request.user, instance_pk=int(self.instance_pk))
+        messages.success(request, "The generation has been queued, see its progress in Jobs")
+        return HttpResponseRedirect(AdminURLHelper(models.Job).index_url)
 
     def get_admin_urls_for_registration(self):
         urls = super().get_admin_urls_for_registration()
@@ -95,6 +95,24 @@ DATABASES = {
     }
 }
 
+# The cache is shared by all the processes (the web workers and the job worker),
+# so that the versions kept in it, e.g. of the process caches and the list filters,
+# are the same everywhere. The table is created by the release step, see the Procfile.
+# It holds the rendered feed items and feeds, the body texts, the reading times and
+# the sitemaps, so it is sized for tens of thousands of entries. When it is full,
+# a tenth of the entries is culled. Nothing which has to survive a cull is kept in
+# it, e.g. the generation of the feeds is in the database, see articles.Generation.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'inform_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -1,4 +1,12 @@
-from articles.feeds import ArticleFeed
+from articles.feeds import (
+    ArticleFeed,
+    ArticleJSONFeed,
+    ArticleTypeFeed,
+    AuthorFeed,
+    SummitFeed,
+    TopicFeed,
+)
+from articles.sitemaps import sitemap_index, sitemap_shard
 from django.conf import settings
 from django.conf.urls import url
 from django.contrib import admin
@@ -10,7 +18,6 @@ from wagtail_transfer import urls as wagtailtransfer_urls
 
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail.core import urls as wagtail_urls
-from wagtail.contrib.sitemaps.views import sitemap
 from wagtail.documents import urls as wagtaildocs_urls
 
 
@@ -21,7 +28,15 @@ def fail(_request):
 urlpatterns = [
     path("api/graphql/",csrf_exempt(GraphQLView.as_view()),name="grapple_graphql"),
     path("api/", include(grapple_urls)),
-    path("admin/", include(wagtailadmin_urls))
+    path("feed/", ArticleFeed(), name="article_feed"),
+    path("feed/json/", ArticleJSONFeed(), name="article_json_feed"),
+    path("feed/topic/<slug:slug>/", TopicFeed(), name="topic_feed"),
+    path("feed/author/<int:pk>/", AuthorFeed(), name="author_feed"),
+    path("feed/summit/<int:pk>/", SummitFeed(), name="summit_feed"),
+    path("feed/type/<str:model_name>/", ArticleTypeFeed(), name="article_type_feed"),
+    path("admin/", include(wagtailadmin_urls)),
+    path("sitemap.xml", sitemap_index, name="sitemap_index"),
+    path("sitemap-<int:shard>.xml", sitemap_shard, name="sitemap_shard"),
 ]
 
 
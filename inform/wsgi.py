@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "inform.settings.base")
 
 application = get_wsgi_application()
+
+# Preload what nearly every request reads, before the first request comes
+from articles.process_cache import warm_up  # noqa: E402
+
+warm_up()